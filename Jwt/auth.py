@@ -6,7 +6,10 @@ from sqlalchemy.orm import Session
 from starlette import status
 from database import SessionLocal
 from Jwt.models import User
-from passlib.context import CryptContext
+from Jwt.hashing import password_hasher
+from Jwt.token_cache import token_cache
+from metrics import add_auth_time
+import time
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer  
 from jose import jwt, JWTError
 from fastapi import Depends
@@ -27,7 +30,6 @@ router = APIRouter(
 SECERT_KEY = JWT_SECRET_KEY
 ALGORITHM = ALGORITHM_JWT
 
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl="auth/token")
 
 class CreateUserRequest(BaseModel):
@@ -52,7 +54,7 @@ async def create_user(db: db_dependency,
                       create_user_request: CreateUserRequest):
     create_user_model = User(
         username=create_user_request.username,
-        hashed_password=bcrypt_context.hash(create_user_request.password),
+        hashed_password=await password_hasher.hash(create_user_request.password),
         
     )
     db.add(create_user_model)
@@ -61,7 +63,7 @@ async def create_user(db: db_dependency,
 @router.post("/token", response_model=Token)
 async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
                                 db:db_dependency):
-    user = authenticate_user(form_data.username,form_data.password, db)
+    user = await authenticate_user(form_data.username,form_data.password, db)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail="Incorrect username or password")
@@ -69,11 +71,19 @@ async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm,
         
     return {"access_token": token, "token_type": "bearer"}
     
-def authenticate_user (username: str, password: str, db):
+@router.get("/hashing/metrics")
+async def hashing_metrics():
+    return password_hasher.metrics()
+
+@router.get("/token/cache/metrics")
+async def token_cache_metrics():
+    return token_cache.metrics()
+
+async def authenticate_user (username: str, password: str, db):
     user = db.query(User).filter(User.username == username).first()
     if not user:
         return False
-    if not bcrypt_context.verify(password, user.hashed_password):
+    if not await password_hasher.verify(password, user.hashed_password):
         return False
     return user
 
@@ -84,6 +94,16 @@ def create_access_token(username: str, user_id: int, expires_delta: timedelta):
      return jwt.encode(encode, SECERT_KEY, algorithm=ALGORITHM)
  
 async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
+     start = time.perf_counter()
+     try:
+         return await validate_token(token)
+     finally:
+         add_auth_time(time.perf_counter() - start)
+
+async def validate_token(token: str):
+     user = token_cache.get(token)
+     if user is not None:
+         return user
      try:
          payload = jwt.decode(token, SECERT_KEY, algorithms=[ALGORITHM])
          username: str = payload.get("sub")
@@ -91,7 +111,10 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
          if username is None or user_id is None:
              raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                  detail="Could not validate user")
-         return {"username": username, "id": user_id}
+         user = {"username": username, "id": user_id}
+         # Cached only once decode has verified the signature and claims
+         token_cache.put(token, user, payload.get("exp"))
+         return user
      except JWTError:
          raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                              detail="Could not validate user")
\ No newline at end of file
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from starlette import status
+from dotenv import load_dotenv
+# Load environment variables from .env
+load_dotenv()
+
+PasswordHashExecutor = os.environ.get("PasswordHashExecutor")
+PasswordHashWorkers = os.environ.get("PasswordHashWorkers")
+PasswordHashQueueSize = os.environ.get("PasswordHashQueueSize")
+
+# "thread" or "process". bcrypt releases the GIL, so threads are usually enough.
+PASSWORD_HASH_EXECUTOR = PasswordHashExecutor or "thread"
+# How many hashes / verifications may run at once
+PASSWORD_HASH_WORKERS = int(PasswordHashWorkers) if PasswordHashWorkers else os.cpu_count() or 1
+# How many more may wait for a worker before new requests get a 503
+PASSWORD_HASH_QUEUE_SIZE = int(PasswordHashQueueSize) if PasswordHashQueueSize else 64
+
+bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Top-level so they can be pickled into a process pool
+def _hash(password: str):
+    start = time.perf_counter()
+    return bcrypt_context.hash(password), time.perf_counter() - start
+
+def _verify(password: str, hashed_password: str):
+    start = time.perf_counter()
+    return bcrypt_context.verify(password, hashed_password), time.perf_counter() - start
+
+class PasswordHasher:
+    def __init__(self, executor: str, workers: int, queue_size: int):
+        self.kind = executor
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.hash_seconds_total = 0.0
+        self.hash_seconds_max = 0.0
+        self.wait_seconds_total = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, func, *args):
+        # The executor's own queue is the wait queue; it is bounded by refusing
+        # work once every worker is busy and queue_size more are already waiting.
+        if self.pending >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Too many password checks in progress, try again later",
+                                headers={"Retry-After": "1"})
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            result, hash_seconds = await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.pending -= 1
+        self.completed += 1
+        self.hash_seconds_total += hash_seconds
+        self.hash_seconds_max = max(self.hash_seconds_max, hash_seconds)
+        self.wait_seconds_total += max(time.perf_counter() - start - hash_seconds, 0.0)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(_verify, password, hashed_password)
+
+    def metrics(self):
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": min(self.pending, self.workers),
+            "queue_depth": max(self.pending - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "hash_seconds_avg": self.hash_seconds_total / self.completed if self.completed else 0.0,
+            "hash_seconds_max": self.hash_seconds_max,
+            "wait_seconds_avg": self.wait_seconds_total / self.completed if self.completed else 0.0,
+        }
+
+password_hasher = PasswordHasher(PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_SIZE)
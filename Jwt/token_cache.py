@@ -0,0 +1,83 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+# Load environment variables from .env
+load_dotenv()
+
+# How many verified tokens to keep, and the longest any of them is trusted
+# without decoding again. An entry never outlives the token's own exp.
+TokenCacheSize = os.environ.get("TokenCacheSize")
+TokenCacheTTL = os.environ.get("TokenCacheTTL")
+
+TOKEN_CACHE_SIZE = int(TokenCacheSize) if TokenCacheSize else 10000
+TOKEN_CACHE_TTL = float(TokenCacheTTL) if TokenCacheTTL else 300
+
+class TokenCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _key(token: str):
+        # Only a digest is kept in memory, never the bearer token itself
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            user, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(user)
+
+    def put(self, token: str, user: dict, exp):
+        # Only call this after the token has been fully verified
+        if exp is None or self.max_size <= 0:
+            return
+        expires_at = min(float(exp), time.time() + self.ttl)
+        if expires_at <= time.time():
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (dict(user), expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
@@ -1,6 +1,5 @@
 import streamlit as st
-import pandas as pd
-import requests
+import todo_client as client
 
 st.set_page_config(
     page_title="Todo App",
@@ -9,22 +8,35 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-def todo_exists(todo_id):
-    response = requests.get(f"{BASE_URL}/todos/{todo_id}")
-    return response.status_code == 200
-
-BASE_URL = "http://127.0.0.1:8000"
+def todo_grid(key):
+    # One page of todos from the server, with search and previous/next. The
+    # stack holds the token of every page up to the current one.
+    state = st.session_state.setdefault(f"grid_{key}", {"q": "", "stack": [None]})
+    q = st.text_input("Search todos", key=f"{key}_search")
+    if q != state["q"]:
+        state["q"] = q
+        state["stack"] = [None]
+    rows, next_token = client.page(state["q"], state["stack"][-1])
+    st.dataframe(client.to_frame(rows), hide_index=True)
+    col1, col2, col3 = st.columns([1, 1, 6])
+    col1.button("Previous", key=f"{key}_previous", disabled=len(state["stack"]) == 1,
+                on_click=state["stack"].pop)
+    col2.button("Next", key=f"{key}_next", disabled=next_token is None,
+                on_click=state["stack"].append, args=(next_token,))
+    col3.caption(f"Page {len(state['stack'])}")
+    return rows
+
+def grid_page(key):
+    # The page todo_grid(key) is on, refetched if a write dropped it
+    state = st.session_state[f"grid_{key}"]
+    return client.to_frame(client.page(state["q"], state["stack"][-1])[0])
 
 def login():
     username = st.text_input("Username:")
     password = st.text_input("Password:", type="password")
     if st.button("Login"):
-        response = requests.post(
-            f"{BASE_URL}/auth/token",
-            data={"username": username, "password": password}
-        )
-        if response.status_code == 200:
-            st.session_state.logged_in = True  # Set the login state to True
+        # Keeps the bearer token in the session for the todo requests
+        if client.login(username, password):
             st.success("Unlock your TodoList now! Simply tap the login button.")
         else:
             st.error("Login failed. Please check your credentials.")
@@ -39,10 +51,7 @@ def signup():
         return
 
     if st.button("Signup"):
-        response = requests.post(
-            f"{BASE_URL}/auth/create/user",
-            json={"username": new_username, "password": new_password}
-        )
+        response = client.signup(new_username, new_password)
         if response.status_code == 201:
             st.success("User created successfully! You can now login.")
         else:
@@ -63,8 +72,8 @@ def create_todo():
 
     # if Todo not in Database to Add the Todo but if Todo have in Database to show the Error Todo id Already Exits
     if st.button("Add Todo"):
-        if not todo_exists(id):
-            response = requests.post(f"{BASE_URL}/todos", json={"id": id, "title": title, "description": description})
+        if not client.todo_exists(id):
+            response = client.create_todo(id, title, description)
             if response.status_code == 200:
                 st.success(f"Added Todo Successfully")
             else:
@@ -72,31 +81,21 @@ def create_todo():
 
 def read_todos():
     st.subheader("View Record")
-    response = requests.get(f"{BASE_URL}/todos/")
-    df = pd.DataFrame(response.json(), columns=["id", "title", "description"])
-    with st.expander("View All Data"):
-        st.dataframe(df)
+    todo_grid("read")
 
 def update_todo():
     st.subheader("Edit/Update Records")
 
-    # Fetch the list of todos
-    response = requests.get(f"{BASE_URL}/todos/")
-    todos = response.json()
-
-    # Display current todos
-    df = pd.DataFrame(todos, columns=["id", "title", "description"])
-    with st.expander("Current Data"):
-        st.dataframe(df)
-
-    # Get the titles of existing todos
-    list_of_todo_titles = [todo['title'] for todo in todos]
+    # Display current todos, one page at a time
+    with st.expander("Current Data", expanded=True):
+        todos = todo_grid("update")
 
-    # Select the todo to edit
-    selected_todo_title = st.selectbox("Todo to Edit", list_of_todo_titles)
+    # Select the todo to edit from the page on screen
+    titles = {todo['id']: todo['title'] for todo in todos}
+    selected_todo_id = st.selectbox("Todo to Edit", list(titles), format_func=lambda todo_id: f"{todo_id} - {titles[todo_id]}")
 
-    # Find the selected todo by title
-    selected_todo = next((todo for todo in todos if todo['title'] == selected_todo_title), None)
+    # Look the selected todo up by id
+    selected_todo = client.get_todo(selected_todo_id) if selected_todo_id is not None else None
 
     if selected_todo:
         # Display details of the selected todo
@@ -120,7 +119,7 @@ def update_todo():
             new_description = st.text_area("Enter Todo Description", description)
 
         if st.button("Update Todo"):
-            response = requests.put(f"{BASE_URL}/todos/{todo_id}", json={"id": new_id, "title": new_title, "description": new_description})
+            response = client.update_todo(todo_id, new_title, new_description)
             if response.status_code == 200:
                 st.success(f"Todo with ID {todo_id} updated successfully")
             elif response.status_code == 404:
@@ -128,29 +127,19 @@ def update_todo():
             else:
                 st.error(f"Failed to update Todo with ID {todo_id}. Status Code: {response.status_code}, Response Text: {response.text}")
 
-    # Fetch the list of todos
-    response2 = requests.get(f"{BASE_URL}/todos/")
-    todos = response2.json()
-
-    # Display current todos
-    df2 = pd.DataFrame(todos, columns=["id", "title", "description"])
+    # Only fetched again if the update went through
     with st.expander("Updated Data"):
-        st.dataframe(df2)
+        st.dataframe(grid_page("update"), hide_index=True)
 
 def delete_todo():
     st.subheader("Delete Records")
-    # Fetch the list of todos
-    response = requests.get(f"{BASE_URL}/todos/")
-    todos = response.json()
-
-    # Display current todos
-    df = pd.DataFrame(todos, columns=["id", "title", "description"])
-    with st.expander("Current Data"):
-        st.dataframe(df)
+    # Display current todos, one page at a time
+    with st.expander("Current Data", expanded=True):
+        todo_grid("delete")
     todo_id = st.text_input("Please provide the Todo ID for deletion")
     st.warning(f"Are you sure you want to delete the selected record? {todo_id}")
     if st.button("Delete Todo"):
-        response = requests.delete(f"{BASE_URL}/todos/{todo_id}")
+        response = client.delete_todo(todo_id)
         if response.status_code == 200:
             st.success(f"Todo with ID {todo_id} deleted successfully")
         elif response.status_code == 404:
@@ -158,17 +147,13 @@ def delete_todo():
         else:
             st.error(f"Failed to delete Todo with ID {todo_id}")
 
-    response2 = requests.get(f"{BASE_URL}/todos/")
-    todos = response2.json()
-
-    # Display current todos
-    df2 = pd.DataFrame(todos, columns=["id", "title", "description"])
     with st.expander("Updated Data"):
-        st.dataframe(df2)
+        st.dataframe(grid_page("delete"), hide_index=True)
 
 def main():
     st.title("Todo App")
-    
+    client.start_rerun()
+
     # Check if user is logged in
     if 'logged_in' not in st.session_state:
         st.session_state.logged_in = False
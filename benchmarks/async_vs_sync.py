@@ -0,0 +1,107 @@
+# Compares requests/sec for GET /todos in the sync (thread pool) and async
+# (AsyncSession) modes of main.py at several client concurrency levels.
+#
+#   python benchmarks/async_vs_sync.py [--rows 1000] [--requests 5000]
+#
+# Each mode runs in its own subprocess against a local SQLite file, because the
+# mode is picked from the environment when main.py is imported.
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONCURRENCY = [50, 200, 1000]
+
+
+async def drive(app, headers, concurrency, total):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    limits = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", limits=limits, headers=headers) as client:
+        remaining = total
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                response = await client.get("/todos", params={"limit": 10})
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - start)
+
+
+def run_mode(args):
+    sys.path.insert(0, ROOT)
+    from datetime import timedelta
+    from main import app
+    from database import SessionLocal, Todo, get_engine
+    from Jwt.auth import create_access_token
+    from Jwt.models import User
+    from migrations import migrate
+
+    migrate(get_engine())
+
+    # Listings only show the caller's todos: seed one user who owns them all
+    db = SessionLocal()
+    if db.query(Todo).count() == 0:
+        db.add(User(id=1, username="bench", hashed_password=""))
+        db.add_all(Todo(id=i, title=f"title {i}", description=f"description {i}", owner_id=1)
+                   for i in range(1, args.rows + 1))
+        db.commit()
+    db.close()
+    headers = {"Authorization": f"Bearer {create_access_token('bench', 1, timedelta(hours=1))}"}
+
+    # One event loop for every level: the async engine's pool is bound to it
+    async def run_all():
+        return {concurrency: await drive(app, headers, concurrency, args.requests) for concurrency in CONCURRENCY}
+
+    print(json.dumps(asyncio.run(run_all())))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--mode", choices=["sync", "async"])
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        report = {}
+        for mode in ["sync", "async"]:
+            env = dict(os.environ, DatabaseConnectionString=f"sqlite:///{path}")
+            env.setdefault("SECERT_KEY_JWT", "bench")
+            env.setdefault("ALGORITHM_JWT", "HS256")
+            env.pop("AsyncDatabaseConnectionString", None)
+            # A sync request keeps its connection until get_db's cleanup gets a
+            # worker thread, and with 1000 clients the threads are all busy
+            # waiting on the pool: let the pool grow so neither mode times out
+            env.setdefault("DatabaseMaxOverflow", "-1")
+            if mode == "async":
+                env["AsyncDatabaseConnectionString"] = f"sqlite+aiosqlite:///{path}"
+            output = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--rows", str(args.rows), "--requests", str(args.requests)],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            report[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'clients':>8} {'sync req/s':>12} {'async req/s':>12}")
+    for concurrency in CONCURRENCY:
+        key = str(concurrency)
+        print(f"{concurrency:>8} {report['sync'][key]:>12.0f} {report['async'][key]:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Worker cold start: importing main.py and getting the schema ready, with the
+# old create_all-on-import steps and with the schema-version check.
+#
+#   python benchmarks/cold_start.py [--runs 5] [--latency-ms 2]
+#
+# Each run is a fresh interpreter against an up-to-date SQLite file. SQLite
+# answers in microseconds, so --latency-ms adds a sleep before every
+# statement to stand in for the round trip to a database server.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_once(mode, latency):
+    start = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    import main
+    imported = time.perf_counter()
+
+    from sqlalchemy import event
+    from database import get_engine
+    from migrations import MIGRATIONS, ensure_schema
+
+    engine = get_engine()
+    statements = 0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def round_trip(conn, cursor, statement, parameters, context, executemany):
+        nonlocal statements
+        statements += 1
+        time.sleep(latency)
+
+    schema_start = time.perf_counter()
+    if mode == "create_all":
+        # What every worker used to do on import
+        for step in MIGRATIONS:
+            step(engine)
+    else:
+        ensure_schema(engine)
+    done = time.perf_counter()
+    print(json.dumps({
+        "import_ms": (imported - start) * 1000,
+        "schema_ms": (done - schema_start) * 1000,
+        "total_ms": (done - start) * 1000,
+        "statements": statements,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=2)
+    parser.add_argument("--mode", choices=["create_all", "version_check"])
+    args = parser.parse_args()
+
+    if args.mode:
+        run_once(args.mode, args.latency_ms / 1000)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DatabaseConnectionString=f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        env.setdefault("SECERT_KEY_JWT", "bench")
+        env.setdefault("ALGORITHM_JWT", "HS256")
+        env.pop("AsyncDatabaseConnectionString", None)
+        subprocess.run([sys.executable, os.path.join(ROOT, "migrations.py")], env=env, check=True, capture_output=True)
+
+        print(f"{'startup':>14} {'import ms':>10} {'schema ms':>10} {'total ms':>9} {'statements':>11}")
+        for mode in ["create_all", "version_check"]:
+            runs = []
+            for _ in range(args.runs):
+                output = subprocess.run(
+                    [sys.executable, __file__, "--mode", mode, "--latency-ms", str(args.latency_ms)],
+                    env=env, check=True, capture_output=True, text=True,
+                ).stdout
+                runs.append(json.loads(output.strip().splitlines()[-1]))
+            median = {key: sorted(run[key] for run in runs)[len(runs) // 2] for key in runs[0]}
+            print(f"{mode:>14} {median['import_ms']:>10.1f} {median['schema_ms']:>10.1f} "
+                  f"{median['total_ms']:>9.1f} {median['statements']:>11}")
+
+
+if __name__ == "__main__":
+    main()
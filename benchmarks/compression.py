@@ -0,0 +1,109 @@
+# Bytes on the wire and CPU time per request for GET /todos pages, uncompressed
+# and with each response encoding.
+#
+#   python benchmarks/compression.py [--pages 10,100,1000] [--requests 50]
+#
+# Each encoding runs in its own subprocess since GzipLevel and BrotliQuality
+# are read when compression.py is imported. brotli is only measured when the
+# brotli package is installed.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENCODINGS = {
+    "identity": ("identity", {}),
+    "gzip 1": ("gzip", {"GzipLevel": "1"}),
+    "gzip 6": ("gzip", {"GzipLevel": "6"}),
+    "gzip 9": ("gzip", {"GzipLevel": "9"}),
+    "br 4": ("br", {"BrotliQuality": "4"}),
+    "br 11": ("br", {"BrotliQuality": "11"}),
+}
+
+
+def run_mode(args):
+    sys.path.insert(0, ROOT)
+    from datetime import timedelta
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert
+    from main import app
+    from database import get_engine, Todo
+    from Jwt.auth import create_access_token
+    from migrations import migrate
+
+    engine = get_engine()
+    migrate(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Todo), [
+            {"id": i, "title": f"Todo number {i}", "description": f"Something that needs doing, item {i}", "owner_id": 1}
+            for i in range(1, max(args.pages) + 1)
+        ])
+
+    client = TestClient(app)
+    headers = {
+        "Authorization": f"Bearer {create_access_token('bench', 1, timedelta(hours=1))}",
+        "Accept-Encoding": ENCODINGS[args.mode][0],
+    }
+    results = {}
+    for size in args.pages:
+        path = f"/todos?limit={size}"
+        response = client.get(path, headers=headers)
+        response.raise_for_status()
+        if response.headers.get("content-encoding", "identity") != ENCODINGS[args.mode][0]:
+            return
+        start = time.process_time()
+        for _ in range(args.requests):
+            client.get(path, headers=headers)
+        results[str(size)] = {
+            "bytes": int(response.headers["content-length"]),
+            "cpu_ms": round((time.process_time() - start) / args.requests * 1000, 3),
+        }
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=lambda value: [int(size) for size in value.split(",")], default=[10, 100, 1000])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--mode", choices=list(ENCODINGS))
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+        return
+
+    report = {}
+    for mode, (_, settings) in ENCODINGS.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DatabaseConnectionString=f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            env.setdefault("SECERT_KEY_JWT", "bench")
+            env.setdefault("ALGORITHM_JWT", "HS256")
+            env.pop("AsyncDatabaseConnectionString", None)
+            env["ListingCacheBackend"] = ""
+            # Every page size gets compressed, as it would above the threshold
+            env["CompressionMinimumSize"] = "0"
+            env.update(settings)
+            output = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--requests", str(args.requests),
+                 "--pages", ",".join(map(str, args.pages))],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout.strip()
+            # Nothing printed: the encoding is not available (brotli not installed)
+            if output:
+                report[mode] = json.loads(output.splitlines()[-1])
+
+    print(f"{'page':>6} {'encoding':>9} {'bytes':>9} {'ratio':>6} {'cpu ms/req':>11}")
+    for size in args.pages:
+        plain = report["identity"][str(size)]["bytes"]
+        for mode, results in report.items():
+            result = results[str(size)]
+            print(f"{size:>6} {mode:>9} {result['bytes']:>9} {result['bytes'] / plain:>6.2f} {result['cpu_ms']:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# POST /todos with and without group commit at several arrival rates.
+#
+#   python benchmarks/group_commit.py [--rates 100,500,2000] [--seconds 3] [--window 0.002]
+#
+# Requests arrive open-loop at a fixed rate (they do not wait for each other),
+# so latency includes any queueing. Each mode runs in its own subprocess
+# against a fresh SQLite file, because GroupCommit is read when main.py is
+# imported. Prints achieved creates/sec and p50/p99 latency in milliseconds.
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+async def drive(app, headers, rate, seconds, first_id):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    limits = httpx.Limits(max_connections=None)
+    latencies = []
+    errors = 0
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", limits=limits, headers=headers) as client:
+
+        async def create(todo_id):
+            nonlocal errors
+            start = time.perf_counter()
+            response = await client.post("/todos", json={"id": todo_id, "title": f"todo {todo_id}"})
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += response.status_code != 200
+
+        total = int(rate * seconds)
+        tasks = []
+        start = time.perf_counter()
+        for i in range(total):
+            delay = start + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(create(first_id + i)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    return {
+        "offered_rps": rate,
+        "achieved_rps": round(total / elapsed, 1),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.5), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+    }
+
+
+def run_mode(args):
+    sys.path.insert(0, ROOT)
+    from datetime import timedelta
+    from main import app
+    from Jwt.auth import create_access_token
+    from group_commit import group_commit_metrics
+    from database import get_engine
+    from migrations import migrate
+
+    migrate(get_engine())
+
+    headers = {"Authorization": f"Bearer {create_access_token('bench', 1, timedelta(hours=1))}"}
+
+    async def run_all():
+        results = {}
+        first_id = 1
+        for rate in args.rates:
+            results[str(rate)] = await drive(app, headers, rate, args.seconds, first_id)
+            first_id += int(rate * args.seconds)
+        return results
+
+    results = asyncio.run(run_all())
+    metrics = group_commit_metrics()
+    results["rows_per_commit"] = round(metrics["rows"] / metrics["batches"], 1) if metrics["batches"] else 1.0
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rates", type=lambda value: [int(rate) for rate in value.split(",")], default=[100, 500, 2000])
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--window", type=float, default=0.002)
+    parser.add_argument("--mode", choices=["off", "on"])
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+        return
+
+    report = {}
+    for mode in ["off", "on"]:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DatabaseConnectionString=f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            env.setdefault("SECERT_KEY_JWT", "bench")
+            env.setdefault("ALGORITHM_JWT", "HS256")
+            env.pop("AsyncDatabaseConnectionString", None)
+            env["GroupCommit"] = "1" if mode == "on" else ""
+            env["GroupCommitWindow"] = str(args.window)
+            output = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--seconds", str(args.seconds),
+                 "--rates", ",".join(map(str, args.rates))],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            report[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'offered/s':>10} {'mode':>5} {'achieved/s':>11} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for rate in args.rates:
+        for mode in ["off", "on"]:
+            result = report[mode][str(rate)]
+            print(f"{rate:>10} {mode:>5} {result['achieved_rps']:>11.0f} {result['p50_ms']:>8.2f} "
+                  f"{result['p99_ms']:>8.2f} {result['errors']:>7}")
+    print(f"rows per commit with group commit: {report['on']['rows_per_commit']}")
+
+
+if __name__ == "__main__":
+    main()
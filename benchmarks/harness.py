@@ -0,0 +1,291 @@
+# Load test for every endpoint, run in-process against a seeded SQLite file.
+#
+#   python benchmarks/harness.py [--users 50] [--todos-per-user 200] [--concurrency 1,8,32]
+#                                [--requests 200] [--output report.json]
+#                                [--baseline baseline.json] [--threshold 0.25]
+#
+# Drives /auth/token, / and every /todos route at each concurrency level and
+# prints a JSON report with throughput and p50/p95/p99 latency per route.
+# With --baseline, every route/level is compared against a saved report and
+# the script exits with status 1 when p95 latency grew, or throughput fell, by
+# more than --threshold (a fraction), or when more requests failed. Save a
+# report with --output and pass it as --baseline on later runs.
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "benchmark-password"
+WORDS = ["groceries", "invoice", "meeting", "deploy", "report", "dentist", "refactor", "garden"]
+BATCH_SIZE = 10
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def seed(args):
+    from sqlalchemy import insert, update
+    from database import engine, Todo, TodoVersion
+    from Jwt.models import User
+    from Jwt.hashing import bcrypt_context
+
+    rng = random.Random(0)
+    # One hash for everybody: seeding 1000s of users should not take minutes of bcrypt
+    hashed_password = bcrypt_context.hash(PASSWORD)
+    with engine.begin() as connection:
+        connection.execute(insert(User), [
+            {"id": user_id, "username": f"user{user_id}", "hashed_password": hashed_password}
+            for user_id in range(1, args.users + 1)
+        ])
+        rows = []
+        for todo_id in range(1, args.users * args.todos_per_user + 1):
+            words = rng.sample(WORDS, 3)
+            rows.append({"id": todo_id, "title": f"{words[0]} {todo_id}",
+                         "description": f"{words[1]} and {words[2]}",
+                         "owner_id": todo_id % args.users + 1, "version": todo_id})
+            if len(rows) == 50000:
+                connection.execute(insert(Todo), rows)
+                rows = []
+        if rows:
+            connection.execute(insert(Todo), rows)
+        connection.execute(update(TodoVersion).values(value=args.users * args.todos_per_user))
+
+
+class Workload:
+    # Builds the requests for each route. Writes get fresh ids; deletes remove
+    # what earlier create requests added, so the seeded data keeps its size.
+    def __init__(self, args):
+        from datetime import timedelta
+        from Jwt.auth import create_access_token
+
+        self.args = args
+        self.rng = random.Random(1)
+        self.tokens = {user_id: create_access_token(f"user{user_id}", user_id, timedelta(hours=1))
+                       for user_id in range(1, args.users + 1)}
+        self.next_id = itertools.count(args.users * args.todos_per_user + 1)
+        self.created = {"single": [], "batch": []}
+
+    def user(self):
+        user_id = self.rng.randrange(1, self.args.users + 1)
+        return user_id, {"Authorization": f"Bearer {self.tokens[user_id]}"}
+
+    def owned_id(self, user_id):
+        # Seeded ids are interleaved: todo_id % users + 1 == owner
+        index = self.rng.randrange(self.args.todos_per_user)
+        return index * self.args.users + (user_id - 1 if user_id > 1 else self.args.users)
+
+    def routes(self):
+        from pagination import encode_cursor
+
+        def login():
+            user_id = self.rng.randrange(1, self.args.users + 1)
+            return "POST", "/auth/token", {"data": {"username": f"user{user_id}", "password": PASSWORD}}
+
+        def root():
+            return "GET", "/", {"headers": self.user()[1]}
+
+        def list_offset():
+            return "GET", "/todos", {"headers": self.user()[1], "params": {"skip": self.rng.randrange(50), "limit": 10}}
+
+        def list_cursor():
+            user_id, headers = self.user()
+            return "GET", "/todos", {"headers": headers, "params": {"cursor": encode_cursor(self.owned_id(user_id)), "limit": 10}}
+
+        def read_one():
+            user_id, headers = self.user()
+            return "GET", f"/todos/{self.owned_id(user_id)}", {"headers": headers}
+
+        def search():
+            return "GET", "/todos/search", {"headers": self.user()[1], "params": {"q": self.rng.choice(WORDS)}}
+
+        def changes():
+            # A client that synced a little while ago: only the latest writes are new to it
+            since = self.args.users * self.args.todos_per_user - self.rng.randrange(1000)
+            return "GET", "/todos/changes", {"headers": self.user()[1], "params": {"since": max(since, 0)}}
+
+        def export():
+            return "GET", "/todos/export", {"headers": self.user()[1]}
+
+        def update():
+            user_id, headers = self.user()
+            todo_id = self.owned_id(user_id)
+            return "PUT", f"/todos/{todo_id}", {"headers": headers, "json": {
+                "todo_id": todo_id, "title": f"updated {todo_id}", "description": self.rng.choice(WORDS)}}
+
+        def create():
+            user_id, headers = self.user()
+            todo_id = next(self.next_id)
+            self.created["single"].append((todo_id, headers))
+            return "POST", "/todos", {"headers": headers, "json": {"id": todo_id, "title": f"new {todo_id}"}}
+
+        def delete():
+            todo_id, headers = self.created["single"].pop()
+            return "DELETE", f"/todos/{todo_id}", {"headers": headers}
+
+        def batch_create():
+            user_id, headers = self.user()
+            ids = [next(self.next_id) for _ in range(BATCH_SIZE)]
+            self.created["batch"].append((ids, headers))
+            return "POST", "/todos/batch", {"headers": headers, "json": [{"id": i, "title": f"new {i}"} for i in ids]}
+
+        def batch_update():
+            user_id, headers = self.user()
+            ids = {self.owned_id(user_id) for _ in range(BATCH_SIZE)}
+            return "PUT", "/todos/batch", {"headers": headers, "json": [
+                {"todo_id": i, "title": f"updated {i}", "description": self.rng.choice(WORDS)} for i in ids]}
+
+        def batch_delete():
+            ids, headers = self.created["batch"].pop()
+            return "POST", "/todos/batch/delete", {"headers": headers, "json": ids}
+
+        def import_ndjson():
+            user_id, headers = self.user()
+            body = "".join(json.dumps({"id": next(self.next_id), "title": "imported"}) + "\n" for _ in range(BATCH_SIZE))
+            return "POST", "/todos/import", {"headers": dict(headers, **{"Content-Type": "application/x-ndjson"}),
+                                            "content": body}
+
+        # Creates run before the deletes that consume their ids
+        return {
+            "POST /auth/token": login,
+            "GET /": root,
+            "GET /todos": list_offset,
+            "GET /todos?cursor": list_cursor,
+            "GET /todos/{todo_id}": read_one,
+            "GET /todos/search": search,
+            "GET /todos/changes": changes,
+            "GET /todos/export": export,
+            "PUT /todos/{todo_id}": update,
+            "POST /todos": create,
+            "DELETE /todos/{todo_id}": delete,
+            "POST /todos/batch": batch_create,
+            "PUT /todos/batch": batch_update,
+            "POST /todos/batch/delete": batch_delete,
+            "POST /todos/import": import_ndjson,
+        }
+
+
+async def drive(client, make_request, concurrency, total):
+    requests = [make_request() for _ in range(total)]
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while requests:
+            method, url, kwargs = requests.pop()
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += response.status_code >= 400
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.5), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+    }
+
+
+async def run(args, routes, only):
+    import httpx
+    from main import app
+
+    results = {name: {} for name in routes if not only or name in only}
+    # A handler that raises counts as a 500, as it would behind a server
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    limits = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", limits=limits) as client:
+        for concurrency in args.concurrency:
+            for name in results:
+                # Logins pay for bcrypt on purpose; a few are enough to measure it
+                total = max(args.requests // 10, concurrency) if name == "POST /auth/token" else args.requests
+                results[name][str(concurrency)] = await drive(client, routes[name], concurrency, total)
+                print(f"{name:>26} c={concurrency:<4} {results[name][str(concurrency)]}", file=sys.stderr)
+    return results
+
+
+def compare(report, baseline, threshold):
+    # Returns one line per route/level that got slower by more than threshold
+    regressions = []
+    for name, levels in report["results"].items():
+        for concurrency, current in levels.items():
+            previous = baseline.get("results", {}).get(name, {}).get(concurrency)
+            if previous is None:
+                continue
+            if current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+                regressions.append(f"{name} c={concurrency}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+            if current["throughput_rps"] < previous["throughput_rps"] * (1 - threshold):
+                regressions.append(f"{name} c={concurrency}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} req/s")
+            if current["errors"] > previous["errors"]:
+                regressions.append(f"{name} c={concurrency}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--todos-per-user", type=int, default=200)
+    parser.add_argument("--concurrency", type=lambda value: [int(level) for level in value.split(",")], default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per route and concurrency level")
+    parser.add_argument("--routes", default="", help="comma-separated subset of route names to run")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DatabaseConnectionString"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ.setdefault("SECERT_KEY_JWT", "benchmark-secret")
+        os.environ.setdefault("ALGORITHM_JWT", "HS256")
+        sys.path.insert(0, ROOT)
+        from database import get_engine
+        from migrations import migrate
+        migrate(get_engine())
+
+        seed(args)
+        routes = Workload(args).routes()
+        only = {name.strip() for name in args.routes.split(",") if name.strip()}
+        results = asyncio.run(run(args, routes, only))
+
+    report = {
+        "meta": {
+            "users": args.users,
+            "todos_per_user": args.todos_per_user,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"no route regressed by more than {args.threshold:.0%}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
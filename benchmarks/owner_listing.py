@@ -0,0 +1,76 @@
+# Per-user listing latency with todos scoped by the (owner_id, id) index.
+#
+#   python benchmarks/owner_listing.py [--users 10000] [--todos-per-user 1000] [--samples 500]
+#
+# Seeds a SQLite file, then times the first page and a deep keyset page of
+# GET /todos' query for random users and prints p50/p99 in milliseconds.
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--todos-per-user", type=int, default=1000)
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DatabaseConnectionString"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        sys.path.insert(0, ROOT)
+        from sqlalchemy import insert
+        from database import engine, SessionLocal, Base, Todo
+
+        Base.metadata.create_all(engine)
+        total = args.users * args.todos_per_user
+        start = time.perf_counter()
+        with engine.begin() as connection:
+            # Interleave owners so one user's todos are spread over the whole table
+            batch = []
+            for todo_id in range(1, total + 1):
+                batch.append({"id": todo_id, "title": f"todo {todo_id}", "owner_id": todo_id % args.users + 1})
+                if len(batch) == 50000:
+                    connection.execute(insert(Todo), batch)
+                    batch = []
+            if batch:
+                connection.execute(insert(Todo), batch)
+        print(f"seeded {args.users} users x {args.todos_per_user} todos in {time.perf_counter() - start:.1f}s")
+
+        db = SessionLocal()
+        plan = db.connection().exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT * FROM todos WHERE owner_id = 1 AND id > 0 ORDER BY id LIMIT 10").fetchall()
+        print("plan:", "; ".join(row[-1] for row in plan))
+
+        rng = random.Random(0)
+        results = {}
+        for name, depth in [("first page", 0), ("deep page", 0.9)]:
+            timings = []
+            for _ in range(args.samples):
+                owner_id = rng.randrange(1, args.users + 1)
+                # The id a cursor would hold after paging through `depth` of the user's todos
+                after_id = int(total * depth)
+                start = time.perf_counter()
+                db.query(Todo).filter(Todo.owner_id == owner_id, Todo.id > after_id).order_by(Todo.id).limit(args.limit + 1).all()
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = timings
+        db.close()
+
+    print(f"{'page':>12} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, timings in results.items():
+        print(f"{name:>12} {percentile(timings, 0.5):>8.3f} {percentile(timings, 0.99):>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Compares /todos/search (FTS5 + bm25) with a naive case-insensitive LIKE
+# scan over title and description on a seeded SQLite file.
+#
+#   python benchmarks/search_vs_ilike.py [--rows 1000000] [--queries 50]
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = ("buy milk eggs bread call plumber dentist email report review budget walk dog "
+         "clean kitchen garage book flight hotel pay rent taxes fix bike car gym run").split()
+
+
+def sentence(rng, length):
+    # The trailing number makes each row findable by a selective query
+    return " ".join(rng.choice(WORDS) for _ in range(length)) + f" ref{rng.randrange(10 ** 6)}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DatabaseConnectionString"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        sys.path.insert(0, ROOT)
+        from sqlalchemy import insert, or_
+        from database import engine, SessionLocal, Base, Todo
+        from search import setup_search, search_todos
+
+        Base.metadata.create_all(engine)
+        setup_search(engine)
+        rng = random.Random(0)
+        start = time.perf_counter()
+        with engine.begin() as connection:
+            for offset in range(0, args.rows, 10000):
+                connection.execute(insert(Todo), [
+                    {"id": i + 1, "title": sentence(rng, 3), "description": sentence(rng, 8), "owner_id": 1}
+                    for i in range(offset, min(offset + 10000, args.rows))
+                ])
+        print(f"seeded {args.rows} rows (with FTS triggers) in {time.perf_counter() - start:.1f}s")
+
+        # A common word plus a rare one, like a user narrowing down a search
+        terms = [f"{rng.choice(WORDS)} ref{rng.randrange(10 ** 6)}" for _ in range(args.queries)]
+        db = SessionLocal()
+
+        def timed(search):
+            start = time.perf_counter()
+            for q in terms:
+                search(q)
+            return (time.perf_counter() - start) / len(terms) * 1000
+
+        def ilike(q):
+            first, second = q.split()
+            matches = [or_(Todo.title.ilike(f"%{word}%"), Todo.description.ilike(f"%{word}%")) for word in (first, second)]
+            return db.query(Todo).filter(Todo.owner_id == 1, *matches).limit(10).all()
+
+        fts_ms = timed(lambda q: search_todos(db, 1, q, 0, 10))
+        ilike_ms = timed(ilike)
+        db.close()
+
+    print(f"{'method':>8} {'ms/query':>10}")
+    print(f"{'fts5':>8} {fts_ms:>10.2f}")
+    print(f"{'ilike':>8} {ilike_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# CPU time and memory per request for GET /todos?limit=1000.
+#
+#   python benchmarks/serialization.py [--rows 5000] [--requests 50]
+#
+# Compares the handler as it used to be (ORM objects, no response model,
+# jsonable_encoder) with the current one (column-only select, response model)
+# and with JsonRenderer=orjson. Each renderer runs in its own subprocess since
+# it is read when main.py is imported. "peak KiB" is the tracemalloc peak
+# above the baseline during one request: a proxy for allocations.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(client, path, headers, requests):
+    for _ in range(5):
+        client.get(path, headers=headers).raise_for_status()
+    start = time.process_time()
+    for _ in range(requests):
+        client.get(path, headers=headers)
+    cpu_ms = (time.process_time() - start) / requests * 1000
+    peaks = []
+    tracemalloc.start()
+    for _ in range(min(requests, 20)):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        client.get(path, headers=headers)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    return {"cpu_ms": round(cpu_ms, 2), "peak_kib": round(sorted(peaks)[len(peaks) // 2] / 1024)}
+
+
+def run_mode(args):
+    sys.path.insert(0, ROOT)
+    from datetime import timedelta
+    from fastapi import Depends
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert
+    from main import app, get_db, get_current_user
+    from database import engine, Todo
+    from Jwt.auth import create_access_token
+    from migrations import migrate
+
+    migrate(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Todo), [
+            {"id": i, "title": f"title {i}", "description": f"description {i}", "owner_id": 1}
+            for i in range(1, args.rows + 1)
+        ])
+
+    # The handler before the fast path, for reference
+    @app.get("/benchmark/orm")
+    def orm_listing(user: dict = Depends(get_current_user), db=Depends(get_db), limit: int = 10):
+        return db.query(Todo).filter(Todo.owner_id == user["id"]).order_by(Todo.id).limit(limit).all()
+
+    # Registered after /todos/{todo_id}; move it ahead so it is reachable
+    app.router.routes.insert(0, app.router.routes.pop())
+
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token('bench', 1, timedelta(hours=1))}"}
+    results = {}
+    if args.mode == "default":
+        results["orm objects, no response model"] = measure(client, "/benchmark/orm?limit=1000", headers, args.requests)
+        results["columns + response model"] = measure(client, "/todos?limit=1000", headers, args.requests)
+    else:
+        results["columns + orjson"] = measure(client, "/todos?limit=1000", headers, args.requests)
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--mode", choices=["default", "orjson"])
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+        return
+
+    report = {}
+    for mode in ["default", "orjson"]:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DatabaseConnectionString=f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            env.setdefault("SECERT_KEY_JWT", "bench")
+            env.setdefault("ALGORITHM_JWT", "HS256")
+            env.pop("AsyncDatabaseConnectionString", None)
+            env["ListingCacheBackend"] = ""
+            env["JsonRenderer"] = "orjson" if mode == "orjson" else ""
+            output = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--rows", str(args.rows), "--requests", str(args.requests)],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            report.update(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'handler':>32} {'cpu ms/req':>11} {'peak KiB':>9}")
+    for name, result in report.items():
+        print(f"{name:>32} {result['cpu_ms']:>11.2f} {result['peak_kib']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import asyncio
+import os
+import threading
+from dotenv import load_dotenv
+# Load environment variables from .env
+load_dotenv()
+
+# In-process pub/sub for todo changes. The write handlers publish an event
+# after they commit; /todos/events (SSE) and /todos/ws (WebSocket) stream the
+# caller's own events. Each subscriber has a bounded buffer: a subscriber that
+# falls CHANGE_FEED_BUFFER events behind is dropped (its stream ends with a
+# "dropped" event and the client refetches) rather than slowing any writer.
+# With several workers, plug in a shared backend (anything implementing
+# FeedBackend) so every worker sees every write.
+ChangeFeedBackend = os.environ.get("ChangeFeedBackend")
+ChangeFeedBuffer = os.environ.get("ChangeFeedBuffer")
+
+CHANGE_FEED_BACKEND = ChangeFeedBackend or "memory"
+CHANGE_FEED_BUFFER = int(ChangeFeedBuffer) if ChangeFeedBuffer else 100
+
+class FeedBackend:
+    # The interface a broker (Redis pub/sub, Postgres LISTEN/NOTIFY, ...)
+    # implements. publish must not block; every event published anywhere is
+    # handed to the callback given to start, on every worker.
+    def start(self, deliver):
+        raise NotImplementedError
+
+    def publish(self, event: dict):
+        raise NotImplementedError
+
+class MemoryFeedBackend(FeedBackend):
+    # Single worker: deliver straight to this process's subscribers
+    def start(self, deliver):
+        self._deliver = deliver
+
+    def publish(self, event: dict):
+        self._deliver(event)
+
+class Subscriber:
+    def __init__(self, hub, owner_id: int, buffer_size: int):
+        self.hub = hub
+        self.owner_id = owner_id
+        self.buffer_size = buffer_size
+        self.dropped = False
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+
+    def offer(self, event: dict):
+        # Called from any thread; the queue is only touched on the subscriber's loop
+        try:
+            self._loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # Its loop has closed without unsubscribing
+            self.hub.unsubscribe(self)
+
+    def _put(self, event: dict):
+        if self.dropped:
+            return
+        if self._queue.qsize() >= self.buffer_size:
+            # Too far behind: discard what it has not read and end the stream
+            self.dropped = True
+            self.hub.drop(self)
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(None)
+            return
+        self._queue.put_nowait(event)
+        self.hub.delivered += 1
+
+    async def get(self, timeout: float = None):
+        # The next event, None once the subscriber has been dropped, or
+        # TimeoutError when nothing arrives in time (time for a keep-alive)
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+class ChangeHub:
+    def __init__(self, backend: FeedBackend = None, buffer_size: int = CHANGE_FEED_BUFFER):
+        self.backend = backend if backend is not None else MemoryFeedBackend()
+        self.buffer_size = buffer_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.backend.start(self.deliver)
+
+    def subscribe(self, owner_id: int) -> Subscriber:
+        # Call from the event loop the subscriber will read on
+        subscriber = Subscriber(self, owner_id, self.buffer_size)
+        with self._lock:
+            self._subscribers.setdefault(owner_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.owner_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.owner_id]
+
+    def drop(self, subscriber: Subscriber):
+        self.dropped += 1
+        self.unsubscribe(subscriber)
+
+    def publish(self, owner_id: int, action: str, todo: dict):
+        self.published += 1
+        self.backend.publish({"owner_id": owner_id, "action": action, "todo": todo})
+
+    def deliver(self, event: dict):
+        # Only hands the event over; never waits on a subscriber
+        with self._lock:
+            subscribers = list(self._subscribers.get(event["owner_id"], ()))
+        for subscriber in subscribers:
+            subscriber.offer(event)
+
+    def metrics(self):
+        with self._lock:
+            subscribers = sum(len(subscribers) for subscribers in self._subscribers.values())
+        return {
+            "subscribers": subscribers,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+def build_backend():
+    if CHANGE_FEED_BACKEND == "memory":
+        return MemoryFeedBackend()
+    raise RuntimeError(f"Unknown ChangeFeedBackend {CHANGE_FEED_BACKEND!r}")
+
+change_hub = ChangeHub(build_backend())
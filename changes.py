@@ -0,0 +1,142 @@
+from sqlalchemy import exists, insert, select, text, update
+from database import Todo, TodoTombstone, TodoVersion
+
+# Versions for delta sync (GET /todos/changes). Every write takes the next
+# numbers from the one-row todo_version table inside its own transaction and
+# stamps them on the rows it writes, or on a tombstone for each delete. The
+# counter row stays locked until the writer commits, so versions become
+# visible in the order they were handed out and a client that has seen
+# version N never misses a change below N that commits later.
+#
+# On SQLite and PostgreSQL that bookkeeping runs in triggers installed by
+# setup_versions, inside the INSERT, UPDATE or DELETE itself, so a write is
+# one statement. stamp and record_deletes only do the work on other dialects.
+TRIGGER_DIALECTS = ("sqlite", "postgresql")
+
+SQLITE_SETUP = [
+    """CREATE TRIGGER IF NOT EXISTS todos_version_insert AFTER INSERT ON todos BEGIN
+        UPDATE todo_version SET value = value + 1 WHERE id = 1;
+        UPDATE todos SET version = (SELECT value FROM todo_version WHERE id = 1) WHERE id = new.id;
+    END""",
+    # Only the columns a client sees: the version stamp itself must not fire it
+    """CREATE TRIGGER IF NOT EXISTS todos_version_update AFTER UPDATE OF title, description, owner_id ON todos BEGIN
+        UPDATE todo_version SET value = value + 1 WHERE id = 1;
+        UPDATE todos SET version = (SELECT value FROM todo_version WHERE id = 1) WHERE id = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS todos_version_delete AFTER DELETE ON todos BEGIN
+        UPDATE todo_version SET value = value + 1 WHERE id = 1;
+        INSERT INTO todo_tombstones (version, id, owner_id, deleted_at)
+            SELECT value, old.id, old.owner_id, CURRENT_TIMESTAMP FROM todo_version WHERE id = 1;
+    END""",
+]
+
+POSTGRESQL_SETUP = [
+    """CREATE OR REPLACE FUNCTION todos_version_stamp() RETURNS trigger AS $$
+    BEGIN
+        UPDATE todo_version SET value = value + 1 WHERE id = 1 RETURNING value INTO NEW.version;
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION todos_version_tombstone() RETURNS trigger AS $$
+    DECLARE
+        bumped integer;
+    BEGIN
+        UPDATE todo_version SET value = value + 1 WHERE id = 1 RETURNING value INTO bumped;
+        INSERT INTO todo_tombstones (version, id, owner_id, deleted_at) VALUES (bumped, OLD.id, OLD.owner_id, now());
+        RETURN OLD;
+    END $$ LANGUAGE plpgsql""",
+    "DROP TRIGGER IF EXISTS todos_version_insert ON todos",
+    "CREATE TRIGGER todos_version_insert BEFORE INSERT ON todos FOR EACH ROW EXECUTE FUNCTION todos_version_stamp()",
+    "DROP TRIGGER IF EXISTS todos_version_update ON todos",
+    """CREATE TRIGGER todos_version_update BEFORE UPDATE OF title, description, owner_id ON todos
+        FOR EACH ROW EXECUTE FUNCTION todos_version_stamp()""",
+    "DROP TRIGGER IF EXISTS todos_version_delete ON todos",
+    "CREATE TRIGGER todos_version_delete AFTER DELETE ON todos FOR EACH ROW EXECUTE FUNCTION todos_version_tombstone()",
+]
+
+def setup_versions(engine):
+    with engine.begin() as connection:
+        # The triggers only bump the counter row, so it has to exist
+        connection.execute(text(
+            "INSERT INTO todo_version (id, value) SELECT 1, (SELECT coalesce(max(version), 0) FROM todos) "
+            "WHERE NOT EXISTS (SELECT 1 FROM todo_version)"))
+        if engine.dialect.name == "sqlite":
+            for statement in SQLITE_SETUP:
+                connection.execute(text(statement))
+        elif engine.dialect.name == "postgresql":
+            for statement in POSTGRESQL_SETUP:
+                connection.execute(text(statement))
+
+def versioned_by_triggers(connection) -> bool:
+    # connection may be a Connection or a Session
+    dialect = connection.dialect if hasattr(connection, "dialect") else connection.get_bind().dialect
+    return dialect.name in TRIGGER_DIALECTS
+
+def next_versions(connection, count: int = 1) -> int:
+    # Reserves count versions and returns the first; connection may be a
+    # Connection or a Session
+    counter = TodoVersion.__table__
+    statement = update(counter).where(counter.c.id == 1).values(value=counter.c.value + count)
+    dialect = connection.dialect if hasattr(connection, "dialect") else connection.get_bind().dialect
+    if dialect.update_returning:
+        # One round trip: the bump hands back the new value
+        value = connection.execute(statement.returning(counter.c.value)).scalar()
+        if value is not None:
+            return value - count + 1
+    elif connection.execute(statement).rowcount:
+        return connection.execute(select(counter.c.value).where(counter.c.id == 1)).scalar_one() - count + 1
+    # A database made by create_all rather than migrations.py
+    connection.execute(insert(counter).values(id=1, value=count))
+    return 1
+
+def stamp(connection, rows: list):
+    # Gives each row dict (inserted or updated) its own version
+    if rows and not versioned_by_triggers(connection):
+        first = next_versions(connection, len(rows))
+        for offset, row in enumerate(rows):
+            row["version"] = first + offset
+    return rows
+
+def record_deletes(connection, owner_id: int, todo_ids):
+    todo_ids = list(todo_ids)
+    if todo_ids and not versioned_by_triggers(connection):
+        first = next_versions(connection, len(todo_ids))
+        connection.execute(insert(TodoTombstone), [
+            {"version": first + offset, "id": todo_id, "owner_id": owner_id}
+            for offset, todo_id in enumerate(todo_ids)
+        ])
+
+def changes_since(connection, owner_id: int, since: int, limit: int):
+    # Two index range scans on (owner_id, version), each stopping after
+    # limit + 1 rows: the cost follows the number of changes, not the table
+    # (the supersession check is a primary-key lookup per tombstone)
+    todos = connection.execute(
+        select(Todo.id, Todo.title, Todo.description, Todo.version)
+        .where(Todo.owner_id == owner_id, Todo.version > since)
+        .order_by(Todo.version).limit(limit + 1)
+    ).all()
+    # A tombstone is superseded once the owner re-creates a todo with that
+    # id; the live row (a higher version) is the only change to send, or a
+    # client applying deletes after upserts would drop it
+    superseded = exists().where(
+        Todo.id == TodoTombstone.id, Todo.owner_id == TodoTombstone.owner_id,
+        Todo.version > TodoTombstone.version,
+    )
+    tombstones = connection.execute(
+        select(TodoTombstone.id, TodoTombstone.version)
+        .where(TodoTombstone.owner_id == owner_id, TodoTombstone.version > since, ~superseded)
+        .order_by(TodoTombstone.version).limit(limit + 1)
+    ).all()
+    changes = sorted(
+        [("todo", row) for row in todos] + [("deleted", row) for row in tombstones],
+        key=lambda change: change[1].version,
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    return {
+        "todos": [{"id": row.id, "title": row.title, "description": row.description, "version": row.version}
+                  for kind, row in changes if kind == "todo"],
+        "deleted": [{"id": row.id, "version": row.version} for kind, row in changes if kind == "deleted"],
+        # Pass this back as since; versions are unique, so no change is split across pages
+        "version": changes[-1][1].version if changes else since,
+        "has_more": has_more,
+    }
@@ -0,0 +1,158 @@
+import os
+import zlib
+from dotenv import load_dotenv
+# Load environment variables from .env
+load_dotenv()
+
+# Response compression negotiated from Accept-Encoding: brotli when the
+# brotli package is installed and the client takes it, otherwise gzip.
+# Bodies under CompressionMinimumSize bytes go out as they are. Streamed
+# responses (export) are compressed chunk by chunk and flushed after each
+# one, so the client still gets rows as soon as they are read.
+CompressionMinimumSize = os.environ.get("CompressionMinimumSize")
+GzipLevel = os.environ.get("GzipLevel")
+BrotliQuality = os.environ.get("BrotliQuality")
+
+COMPRESSION_MINIMUM_SIZE = int(CompressionMinimumSize) if CompressionMinimumSize else 500
+GZIP_LEVEL = int(GzipLevel) if GzipLevel else 6
+BROTLI_QUALITY = int(BrotliQuality) if BrotliQuality else 4
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+def accepted_encodings(accept_encoding: str):
+    # {"gzip": 1.0, "br": 0.5, ...}; a q of 0 means "not acceptable"
+    encodings = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            encodings[name.lower()] = quality
+    return encodings
+
+def choose_encoding(accept_encoding: str, brotli_available: bool = brotli is not None):
+    encodings = accepted_encodings(accept_encoding)
+    wildcard = encodings.get("*", 0.0)
+    candidates = ["br", "gzip"] if brotli_available else ["gzip"]
+    best = None
+    for encoding in candidates:
+        quality = encodings.get(encoding, wildcard)
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (encoding, quality)
+    return best[0] if best else None
+
+class GzipEncoder:
+    def __init__(self, level: int):
+        # wbits 16 + MAX_WBITS: gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH)
+
+class BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+def add_vary(headers):
+    # Merge into an existing Vary header rather than sending a second one
+    for index, (name, value) in enumerate(headers):
+        if name.lower() == b"vary":
+            values = [part.strip().lower() for part in value.split(b",")]
+            if b"accept-encoding" not in values and b"*" not in values:
+                headers[index] = (name, value + b", Accept-Encoding")
+            return headers
+    headers.append((b"vary", b"Accept-Encoding"))
+    return headers
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MINIMUM_SIZE, gzip_level: int = GZIP_LEVEL,
+                 brotli_quality: int = BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def encoder(self, encoding: str):
+        if encoding == "br":
+            return BrotliEncoder(self.brotli_quality)
+        return GzipEncoder(self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+        encoding = choose_encoding(accept_encoding)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder = None
+
+        async def send_wrapper(message):
+            nonlocal start_message, encoder
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether to compress
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start_message is not None:
+                headers = {name.lower(): value for name, value in start_message["headers"]}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                negotiable = b"content-encoding" not in headers and content_type.startswith(COMPRESSIBLE_TYPES)
+                if negotiable and (more_body or len(body) >= self.minimum_size):
+                    encoder = self.encoder(encoding)
+                    raw_headers = [(name, value) for name, value in start_message["headers"]
+                                   if name.lower() != b"content-length"]
+                    raw_headers.append((b"content-encoding", encoding.encode()))
+                    add_vary(raw_headers)
+                    if not more_body:
+                        body = encoder.finish(body)
+                        encoder = None
+                        raw_headers.append((b"content-length", str(len(body)).encode()))
+                    start_message["headers"] = raw_headers
+                    message = {"type": "http.response.body", "body": body, "more_body": more_body}
+                elif negotiable:
+                    # Too small to compress this time, but a cache still must not
+                    # hand this copy to a client that asked differently
+                    start_message["headers"] = add_vary(list(start_message["headers"]))
+                await send(start_message)
+                start_message = None
+
+            if encoder is None:
+                await send(message)
+                return
+            # Streamed: flush after every chunk so nothing waits for the next one
+            await send({"type": "http.response.body",
+                        "body": encoder.chunk(body) if more_body else encoder.finish(body),
+                        "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
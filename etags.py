@@ -0,0 +1,22 @@
+import hashlib
+from fastapi import Request, Response
+from starlette import status
+
+# Weak ETags for todo responses. The validator is a digest of the response
+# data, so a client polling unchanged data gets a 304 and no body at all.
+
+def make_etag(body) -> str:
+    return 'W/"' + hashlib.sha1(repr(body).encode()).hexdigest() + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" match
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
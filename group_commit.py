@@ -0,0 +1,121 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from database import Todo
+from changes import stamp
+from dotenv import load_dotenv
+# Load environment variables from .env
+load_dotenv()
+
+# Optional group commit for POST /todos (GroupCommit=1). Creates are handed to
+# one writer thread per engine, which waits up to GroupCommitWindow seconds
+# after the first one for more (or until GroupCommitMaxBatch are queued) and
+# inserts them all in a single transaction: one commit, one fsync. Creates
+# that arrive while a commit is running simply form the next batch. Every
+# caller still gets back its own row, or its own exception.
+GroupCommit = os.environ.get("GroupCommit")
+GroupCommitWindow = os.environ.get("GroupCommitWindow")
+GroupCommitMaxBatch = os.environ.get("GroupCommitMaxBatch")
+
+GROUP_COMMIT_ENABLED = (GroupCommit or "").lower() in ("1", "true", "yes")
+GROUP_COMMIT_WINDOW = float(GroupCommitWindow) if GroupCommitWindow else 0.002
+GROUP_COMMIT_MAX_BATCH = int(GroupCommitMaxBatch) if GroupCommitMaxBatch else 64
+
+class GroupCommitter:
+    def __init__(self, bind, window: float = GROUP_COMMIT_WINDOW, max_batch: int = GROUP_COMMIT_MAX_BATCH):
+        self.bind = bind
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+        self._thread.start()
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+
+    def submit(self, row: dict):
+        future = Future()
+        self._queue.put((row, future))
+        return future
+
+    def insert(self, row: dict):
+        # Blocks the calling (thread pool) thread until the row's batch is committed
+        return self.submit(row).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            try:
+                # Once the window is over this still takes what is already queued
+                batch.append(self._queue.get(timeout=max(deadline - time.perf_counter(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._commit(batch)
+            except Exception as exc:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+
+    def _commit(self, batch):
+        try:
+            with self.bind.begin() as connection:
+                connection.execute(insert(Todo), stamp(connection, [row for row, _ in batch]))
+        except IntegrityError:
+            # One bad row fails the whole statement: commit the rest one by one
+            # so only the callers whose rows conflict see the error
+            for row, future in batch:
+                try:
+                    with self.bind.begin() as connection:
+                        connection.execute(insert(Todo), stamp(connection, [row]))
+                except Exception as exc:
+                    future.set_exception(exc)
+                else:
+                    future.set_result(row)
+        else:
+            for row, future in batch:
+                future.set_result(row)
+        self.batches += 1
+        self.rows += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+    def metrics(self):
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "rows_per_batch": self.rows / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "queued": self._queue.qsize(),
+        }
+
+_committers = {}
+_committers_lock = threading.Lock()
+
+def committer_for(bind):
+    # One writer per engine, so a dependency override's engine gets its own
+    with _committers_lock:
+        committer = _committers.get(bind)
+        if committer is None:
+            committer = _committers[bind] = GroupCommitter(bind)
+        return committer
+
+def group_commit_metrics():
+    with _committers_lock:
+        committers = list(_committers.values())
+    metrics = {"enabled": GROUP_COMMIT_ENABLED, "batches": 0, "rows": 0, "largest_batch": 0}
+    for committer in committers:
+        snapshot = committer.metrics()
+        metrics["batches"] += snapshot["batches"]
+        metrics["rows"] += snapshot["rows"]
+        metrics["largest_batch"] = max(metrics["largest_batch"], snapshot["largest_batch"])
+    return metrics
@@ -0,0 +1,21 @@
+import os
+from fastapi import Response
+from dotenv import load_dotenv
+# Load environment variables from .env
+load_dotenv()
+
+# Optional orjson rendering for the large list reads (JsonRenderer=orjson).
+# Those handlers already hold plain dicts, so with it they return the rendered
+# bytes directly and skip response-model validation altogether. orjson is
+# only imported, and only needs to be installed, when it is turned on.
+JsonRenderer = os.environ.get("JsonRenderer")
+
+FAST_JSON = JsonRenderer == "orjson"
+if FAST_JSON:
+    import orjson
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
@@ -0,0 +1,238 @@
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from dotenv import load_dotenv
+# Load environment variables from .env
+load_dotenv()
+
+# Read-through cache for GET /todos pages. "memory" keeps pages in this
+# process; leave empty to turn the cache off. With several workers use a
+# shared backend (anything implementing CacheBackend), otherwise a worker may
+# serve a page another worker's write has changed until its TTL runs out.
+ListingCacheSize = os.environ.get("ListingCacheSize")
+ListingCacheTTL = os.environ.get("ListingCacheTTL")
+
+LISTING_CACHE_BACKEND = os.environ.get("ListingCacheBackend", "")
+LISTING_CACHE_SIZE = int(ListingCacheSize) if ListingCacheSize else 1024
+LISTING_CACHE_TTL = float(ListingCacheTTL) if ListingCacheTTL else 30
+
+class CacheBackend:
+    # The interface a shared store (Redis, memcached, ...) implements. Pages
+    # live under their owner (a Redis hash per owner, say), next to a
+    # per-owner generation counter, so a write only ever touches its owner's
+    # pages. Values are plain JSON-compatible dicts.
+    def get(self, owner_id: int, key: str):
+        raise NotImplementedError
+
+    def set(self, owner_id: int, key: str, value: dict, generation: int):
+        # Stores the page only while the owner is still at generation;
+        # check and store must be atomic (e.g. WATCH/MULTI in Redis)
+        raise NotImplementedError
+
+    def pages(self, owner_id: int):
+        # (key, value) pairs of one owner's pages, used to find those a write touches
+        raise NotImplementedError
+
+    def delete(self, owner_id: int, keys: list):
+        raise NotImplementedError
+
+    def generation(self, owner_id: int) -> int:
+        raise NotImplementedError
+
+    def bump(self, owner_id: int):
+        # Moves the owner to a new generation (e.g. INCR in Redis)
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+class MemoryCacheBackend(CacheBackend):
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        # (owner_id, key) -> (value, expires_at), least recently used first
+        self._entries = OrderedDict()
+        self._pages = {}
+        # Never reset, or a page read before a write could be stored after it
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _remove(self, entry_key):
+        del self._entries[entry_key]
+        owner_id, key = entry_key
+        keys = self._pages[owner_id]
+        keys.discard(key)
+        if not keys:
+            del self._pages[owner_id]
+
+    def get(self, owner_id: int, key: str):
+        with self._lock:
+            entry = self._entries.get((owner_id, key))
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove((owner_id, key))
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end((owner_id, key))
+            self.hits += 1
+            return value
+
+    def set(self, owner_id: int, key: str, value: dict, generation: int):
+        with self._lock:
+            if self._generations.get(owner_id, 0) != generation:
+                return
+            self._entries[(owner_id, key)] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end((owner_id, key))
+            self._pages.setdefault(owner_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def pages(self, owner_id: int):
+        with self._lock:
+            return [(key, self._entries[(owner_id, key)][0]) for key in self._pages.get(owner_id, ())]
+
+    def delete(self, owner_id: int, keys: list):
+        with self._lock:
+            for key in keys:
+                if (owner_id, key) in self._entries:
+                    self._remove((owner_id, key))
+
+    def generation(self, owner_id: int) -> int:
+        with self._lock:
+            return self._generations.get(owner_id, 0)
+
+    def bump(self, owner_id: int):
+        with self._lock:
+            self._generations[owner_id] = self._generations.get(owner_id, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pages.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+def todo_to_dict(todo):
+    return {"id": todo.id, "title": todo.title, "description": todo.description}
+
+class ListingCache:
+    # Pages are per owner. Every cached page remembers which slice of its
+    # owner's id-ordered todos it shows, so a write only drops the pages it
+    # can change:
+    #   after - keyset pages start after this id (None for offset pages)
+    #   first / last - the first and last id on the page
+    #   open - the page runs to the end of the table
+    #
+    # Pages are cached with their ETag and come back as (body, etag). Readers
+    # take generation(owner_id) before querying and hand it back to set_*: a
+    # page read while one of that owner's writes was being invalidated is not
+    # cached. The counter lives in the backend, so this holds across workers.
+    def __init__(self, backend: CacheBackend = None):
+        self.backend = backend
+        self.invalidations = 0
+
+    def generation(self, owner_id: int):
+        return None if self.backend is None else self.backend.generation(owner_id)
+
+    def get_offset(self, owner_id: int, skip: int, limit: int):
+        return self._get(owner_id, f"offset:{skip}:{limit}")
+
+    def set_offset(self, owner_id: int, skip: int, limit: int, todos: list, etag: str, generation: int):
+        self._set(owner_id, f"offset:{skip}:{limit}", todos, etag, None, todos, len(todos) < limit, generation)
+
+    def get_keyset(self, owner_id: int, after_id: int, limit: int):
+        return self._get(owner_id, f"keyset:{after_id}:{limit}")
+
+    def set_keyset(self, owner_id: int, after_id: int, limit: int, page: dict, etag: str, generation: int):
+        self._set(owner_id, f"keyset:{after_id}:{limit}", page, etag, after_id, page["todos"], page["next_cursor"] is None, generation)
+
+    def _get(self, owner_id: int, key: str):
+        if self.backend is None:
+            return None
+        entry = self.backend.get(owner_id, key)
+        return None if entry is None else (entry["body"], entry["etag"])
+
+    def _set(self, owner_id: int, key: str, body, etag: str, after_id, todos: list, open_ended: bool, generation: int):
+        if self.backend is None:
+            return
+        self.backend.set(owner_id, key, {
+            "body": body,
+            "etag": etag,
+            "after": after_id,
+            "first": todos[0]["id"] if todos else None,
+            "last": todos[-1]["id"] if todos else None,
+            "open": open_ended,
+        }, generation)
+
+    def invalidate(self, owner_id: int, todo_ids, shifts: bool):
+        # shifts: rows were inserted or deleted, so later offset pages move too.
+        # Otherwise only rows' contents changed (an update).
+        if self.backend is None:
+            return
+        todo_ids = sorted(todo_ids)
+        if not todo_ids:
+            return
+        # Before the scan, so a reader that queried before this write cannot
+        # store its page after the scan has passed
+        self.backend.bump(owner_id)
+        affected = [key for key, entry in self.backend.pages(owner_id) if self._affected(entry, todo_ids, shifts)]
+        if affected:
+            self.backend.delete(owner_id, affected)
+            self.invalidations += len(affected)
+
+    @staticmethod
+    def _affected(entry: dict, todo_ids: list, shifts: bool):
+        if not shifts:
+            if entry["first"] is None:
+                return False
+            # Any updated id within [first, last]
+            start = bisect_left(todo_ids, entry["first"])
+            return start < len(todo_ids) and todo_ids[start] <= entry["last"]
+        # The smallest changed id the page could show
+        start = 0 if entry["after"] is None else bisect_right(todo_ids, entry["after"])
+        if start == len(todo_ids):
+            return False
+        return entry["open"] or (entry["last"] is not None and todo_ids[start] <= entry["last"])
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        if self.backend is None:
+            return {"backend": None}
+        return dict(self.backend.stats(), invalidations=self.invalidations)
+
+def build_backend():
+    if LISTING_CACHE_BACKEND == "memory":
+        return MemoryCacheBackend(LISTING_CACHE_SIZE, LISTING_CACHE_TTL)
+    return None
+
+listing_cache = ListingCache(build_backend())
@@ -1,35 +1,75 @@
-from fastapi import FastAPI, status, HTTPException, Depends
+import time
+IMPORT_STARTED = time.perf_counter()
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, status, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine, Todo
-from pydantic import BaseModel
+from database import SessionLocal, get_engine, Todo, AsyncSessionLocal, get_db, pool_metrics, async_pool_metrics, read_replicas
+from schemas import TodoCreate, TodoUpdate, TodoOut, TodoPage
+from json_response import FAST_JSON, FastJSONResponse
+from pagination import MAX_PAGE_SIZE, decode_cursor, keyset_page
+from listing_cache import listing_cache, todo_to_dict
+from change_feed import change_hub
+from changes import stamp, record_deletes
+from etags import make_etag, etag_matches, not_modified
+from search import search_todos
+from migrations import ensure_schema, LATEST_VERSION
+from metrics import MetricsMiddleware, registry
+from compression import CompressionMiddleware
+from group_commit import GROUP_COMMIT_ENABLED, committer_for, group_commit_metrics
+from query_diagnostics import QueryDiagnosticsMiddleware, query_diagnostics
+from Jwt.hashing import password_hasher
+from Jwt.token_cache import token_cache
 import Jwt.models as models
 import Jwt.auth as auth
-from database import engine, SessionLocal, Base
-from typing import Annotated
+import todos_async
+import todos_batch
+import todos_export
+import todos_import
+import todos_feed
+import todos_changes
+import todo_writes
+from todo_writes import todo_fields, written_row
+from database import SessionLocal, Base
+from typing import Annotated, List, Union
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from Jwt.auth import get_current_user
-app = FastAPI()
-app.include_router(auth.router)
+# Filled in as the worker starts; served as gauges on /metrics
+startup_timings = {}
+
+@asynccontextmanager
+async def lifespan(app):
+    # The first database work of the worker: usually a single schema-version
+    # read, DDL only when the database is behind (see migrations.py)
+    start = time.perf_counter()
+    engine = get_engine()
+    startup_timings["engine_seconds"] = time.perf_counter() - start
+    start = time.perf_counter()
+    startup_timings["schema_version_found"] = ensure_schema(engine)
+    startup_timings["schema_version"] = LATEST_VERSION
+    startup_timings["schema_seconds"] = time.perf_counter() - start
+    yield
 
-models.Base.metadata.create_all(engine)
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(QueryDiagnosticsMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.include_router(auth.router)
 
-class TodoCreate(BaseModel):
-    id : int
-    title: str
-    description: str = None
+# Fixed /todos/... paths go first so /todos/{todo_id} does not swallow them
+app.include_router(todos_batch.router)
+app.include_router(todos_export.router)
+app.include_router(todos_import.router)
+app.include_router(todos_feed.router)
+app.include_router(todos_changes.router)
 
-class TodoUpdate(BaseModel):
-    todo_id: int
-    title: str
-    description: str = None
+# Opt-in async mode: the AsyncSession handlers are registered first, so they
+# take precedence over the sync /todos handlers below.
+if AsyncSessionLocal is not None:
+    app.include_router(todos_async.router)
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
@@ -39,35 +79,153 @@ async def user(user: user_dependency, db: db_dependency):
         raise HTTPException(status_code=401, detail="Authentication Failed")
     return {"User": user}
 
-@app.post("/todos")
-def create_todo(todo: TodoCreate, db: Session = Depends(get_db)):
-    
-    db_todo = Todo(**todo.dict())
-    db.add(db_todo)
+# Subsystem counters exported as gauges on /metrics
+registry.register_collector("db_pool", pool_metrics.snapshot)
+if AsyncSessionLocal is not None:
+    registry.register_collector("db_async_pool", async_pool_metrics.snapshot)
+registry.register_collector("listing_cache", listing_cache.stats)
+registry.register_collector("token_cache", token_cache.metrics)
+registry.register_collector("password_hashing", password_hasher.metrics)
+registry.register_collector("query_diagnostics", query_diagnostics.metrics)
+registry.register_collector("read_replicas", read_replicas.metrics)
+registry.register_collector("group_commit", group_commit_metrics)
+registry.register_collector("change_feed", change_hub.metrics)
+registry.register_collector("startup", lambda: startup_timings)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/routes")
+def route_metrics():
+    return registry.summary()
+
+@app.get("/database/pool/metrics")
+def database_pool_metrics():
+    metrics = {"sync": pool_metrics.snapshot()}
+    if AsyncSessionLocal is not None:
+        metrics["async"] = async_pool_metrics.snapshot()
+    if read_replicas.replicas:
+        metrics["replicas"] = read_replicas.metrics()
+    return metrics
+
+@app.post("/todos", response_model=TodoOut)
+def create_todo(todo: TodoCreate, user: user_dependency, db: Session = Depends(get_db)):
+    if GROUP_COMMIT_ENABLED:
+        # Committed together with whatever other creates arrive in the same window
+        try:
+            row = committer_for(db.get_bind()).insert(dict(todo.dict(), owner_id=user["id"]))
+        except IntegrityError:
+            # Ids are global: it may belong to another user
+            raise HTTPException(status_code=409, detail="Todo already exists")
+        listing_cache.invalidate(user["id"], [row["id"]], shifts=True)
+        row = todo_fields(row)
+        change_hub.publish(user["id"], "created", row)
+        return row
+    dialect = db.get_bind().dialect
+    values = stamp(db, [dict(todo.dict(), owner_id=user["id"])])[0]
+    # No refresh after commit: the INSERT hands back the row
+    try:
+        row = written_row(db.execute(todo_writes.insert_todo(dialect, values)), dialect.insert_returning, values)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Todo already exists")
     db.commit()
-    db.refresh(db_todo)
-    return db_todo
+    listing_cache.invalidate(user["id"], [row["id"]], shifts=True)
+    change_hub.publish(user["id"], "created", row)
+    return row
+
+@app.get("/todos", response_model=Union[TodoPage, List[TodoOut]])
+def read_todos(request: Request, response: Response, user: user_dependency, skip: int = Query(0, ge=0),
+               limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE), cursor: str = None, db: Session = Depends(get_db)):
+    owner_id = user["id"]
+    # A lagging replica could hand back a page from before a write that has
+    # already invalidated the cache, so only primary reads fill it
+    cacheable = not read_replicas.is_replica(db.get_bind())
+    # Cursor mode: a range scan on the (owner_id, id) index, so every page costs the same
+    if cursor is not None:
+        after_id = decode_cursor(cursor)
+        cached = listing_cache.get_keyset(owner_id, after_id, limit)
+        if cached is None:
+            generation = listing_cache.generation(owner_id)
+            # Columns only: rows become dicts without building ORM objects
+            query = select(Todo.id, Todo.title, Todo.description).where(Todo.owner_id == owner_id)
+            if after_id is not None:
+                query = query.where(Todo.id > after_id)
+            todos = db.execute(query.order_by(Todo.id).limit(limit + 1))
+            body = keyset_page([todo_to_dict(todo) for todo in todos], limit)
+            etag = make_etag(body)
+            if cacheable:
+                listing_cache.set_keyset(owner_id, after_id, limit, body, etag, generation)
+        else:
+            body, etag = cached
+    else:
+        cached = listing_cache.get_offset(owner_id, skip, limit)
+        if cached is None:
+            generation = listing_cache.generation(owner_id)
+            todos = db.execute(select(Todo.id, Todo.title, Todo.description).where(Todo.owner_id == owner_id)
+                               .order_by(Todo.id).offset(skip).limit(limit))
+            body = [todo_to_dict(todo) for todo in todos]
+            etag = make_etag(body)
+            if cacheable:
+                listing_cache.set_offset(owner_id, skip, limit, body, etag, generation)
+        else:
+            body, etag = cached
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    if FAST_JSON:
+        return FastJSONResponse(body, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return body
 
-@app.get("/todos")
-def read_todos(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    todos = db.query(Todo).offset(skip).limit(limit).all()
-    return todos
+@app.get("/todos/cache/metrics")
+def listing_cache_metrics():
+    return listing_cache.stats()
 
-@app.put("/todos/{todo_id}")
-def update_todo(todo_id: int, updated_todo: TodoUpdate, db: Session = Depends(get_db)):
-    db_todo = db.query(Todo).filter(Todo.id == todo_id).first()
+@app.get("/todos/search", response_model=List[TodoOut])
+def search(q: str, user: user_dependency, skip: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+           db: Session = Depends(get_db)):
+    results = search_todos(db, user["id"], q, skip, limit)
+    if FAST_JSON:
+        return FastJSONResponse(results)
+    return results
+
+@app.get("/todos/{todo_id}", response_model=TodoOut)
+def read_todo(todo_id: int, request: Request, response: Response, user: user_dependency, db: Session = Depends(get_db)):
+    db_todo = db.query(Todo).filter(Todo.owner_id == user["id"], Todo.id == todo_id).first()
     if db_todo is None:
         raise HTTPException(status_code=404, detail="Todo not found")
-    for key, value in updated_todo.dict().items():
-        setattr(db_todo, key, value)
+    todo = todo_to_dict(db_todo)
+    etag = make_etag(todo)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    return todo
+
+@app.put("/todos/{todo_id}", response_model=TodoOut)
+def update_todo(todo_id: int, updated_todo: TodoUpdate, user: user_dependency, db: Session = Depends(get_db)):
+    dialect = db.get_bind().dialect
+    values = stamp(db, [updated_todo.dict(exclude={"todo_id"})])[0]
+    result = db.execute(todo_writes.update_todo(dialect, user["id"], todo_id, values))
+    row = written_row(result, dialect.update_returning, dict(values, id=todo_id))
+    if row is None:
+        # Nothing matched: any version bump is rolled back with the session
+        raise HTTPException(status_code=404, detail="Todo not found")
     db.commit()
-    return db_todo
+    listing_cache.invalidate(user["id"], [todo_id], shifts=False)
+    change_hub.publish(user["id"], "updated", row)
+    return row
 
 @app.delete("/todos/{todo_id}")
-def delete_todo(todo_id: int, db: Session = Depends(get_db)):
-    db_todo = db.query(Todo).filter(Todo.id == todo_id).first()
-    if db_todo is None:
+def delete_todo(todo_id: int, user: user_dependency, db: Session = Depends(get_db)):
+    dialect = db.get_bind().dialect
+    result = db.execute(todo_writes.delete_todo(dialect, user["id"], todo_id))
+    if written_row(result, dialect.delete_returning, {"id": todo_id}) is None:
         raise HTTPException(status_code=404, detail="Todo not found")
-    db.delete(db_todo)
+    record_deletes(db, user["id"], [todo_id])
     db.commit()
-    return {"message": "Todo deleted"}
\ No newline at end of file
+    listing_cache.invalidate(user["id"], [todo_id], shifts=True)
+    change_hub.publish(user["id"], "deleted", {"id": todo_id})
+    return {"message": "Todo deleted"}
+
+startup_timings["import_seconds"] = time.perf_counter() - IMPORT_STARTED
@@ -0,0 +1,199 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Request metrics: per-route latency histograms from an ASGI middleware, SQL
+# time and statement counts from cursor execute hooks, and pool-wait / auth
+# time from the code that spends it. Everything is rendered in the Prometheus
+# text format on /metrics. Each request only pays for a few perf_counter
+# calls and dict updates.
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class RequestStats:
+    __slots__ = ("sql_seconds", "statements", "pool_wait_seconds", "auth_seconds")
+
+    def __init__(self):
+        self.sql_seconds = 0.0
+        self.statements = 0
+        self.pool_wait_seconds = 0.0
+        self.auth_seconds = 0.0
+
+# The stats of the request being served. Starlette copies the context into
+# its thread pool, so sync handlers add to the same object.
+current_request = ContextVar("current_request", default=None)
+
+def add_pool_wait(seconds: float):
+    stats = current_request.get()
+    if stats is not None:
+        stats.pool_wait_seconds += seconds
+
+def add_auth_time(seconds: float):
+    stats = current_request.get()
+    if stats is not None:
+        stats.auth_seconds += seconds
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float):
+        # Upper bound of the bucket holding the q-th observation
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), self.counts):
+            seen += count
+            if seen >= target and count:
+                return bound
+        return 0.0
+
+class RouteMetrics:
+    def __init__(self):
+        self.latency = Histogram()
+        self.sql = Histogram()
+        self.statements = 0
+        self.pool_wait_seconds = 0.0
+        self.auth_seconds = 0.0
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = {}
+        # name -> callable returning a dict; numeric values become gauges
+        self.collectors = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        with self._lock:
+            metrics = self.routes.get((method, route, status))
+            if metrics is None:
+                metrics = self.routes[(method, route, status)] = RouteMetrics()
+            metrics.latency.observe(seconds)
+            metrics.sql.observe(stats.sql_seconds)
+            metrics.statements += stats.statements
+            metrics.pool_wait_seconds += stats.pool_wait_seconds
+            metrics.auth_seconds += stats.auth_seconds
+
+    def register_collector(self, name: str, collect):
+        self.collectors[name] = collect
+
+    def summary(self):
+        # Per-route breakdown for humans: where the time of an average request goes
+        with self._lock:
+            items = list(self.routes.items())
+        summary = []
+        for (method, route, status), metrics in sorted(items):
+            count = metrics.latency.count
+            summary.append({
+                "method": method,
+                "route": route,
+                "status": status,
+                "requests": count,
+                "p50_seconds": metrics.latency.quantile(0.5),
+                "p95_seconds": metrics.latency.quantile(0.95),
+                "p99_seconds": metrics.latency.quantile(0.99),
+                "avg_seconds": metrics.latency.sum / count,
+                "avg_sql_seconds": metrics.sql.sum / count,
+                "avg_pool_wait_seconds": metrics.pool_wait_seconds / count,
+                "avg_auth_seconds": metrics.auth_seconds / count,
+                "avg_statements": metrics.statements / count,
+            })
+        return summary
+
+    def render(self):
+        lines = []
+        with self._lock:
+            items = sorted(self.routes.items())
+            histograms = [
+                ("http_request_duration_seconds", "Request latency by route.", lambda m: m.latency),
+                ("http_request_sql_seconds", "SQL time spent per request by route.", lambda m: m.sql),
+            ]
+            for name, help_text, pick in histograms:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for (method, route, status), metrics in items:
+                    labels = f'method="{method}",route="{route}",status="{status}"'
+                    histogram = pick(metrics)
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+                    lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+            counters = [
+                ("http_request_sql_statements_total", "SQL statements executed by route.", lambda m: m.statements),
+                ("http_request_pool_wait_seconds_total", "Time spent waiting for a pooled connection by route.", lambda m: m.pool_wait_seconds),
+                ("http_request_auth_seconds_total", "Time spent validating bearer tokens by route.", lambda m: m.auth_seconds),
+            ]
+            for name, help_text, pick in counters:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for (method, route, status), metrics in items:
+                    lines.append(f'{name}{{method="{method}",route="{route}",status="{status}"}} {pick(metrics)}')
+        for collector, collect in sorted(self.collectors.items()):
+            for key, value in collect().items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"todo_app_{collector}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            # The route template, not the raw path, keeps label cardinality bounded
+            route = scope.get("route")
+            registry.observe(scope["method"], getattr(route, "path", "unmatched"), status_code,
+                             time.perf_counter() - start, stats)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = current_request.get()
+    if stats is not None:
+        stats.sql_seconds += elapsed
+        stats.statements += 1
+
+@event.listens_for(Engine, "handle_error")
+def handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start"):
+        connection.info["query_start"].pop()
@@ -0,0 +1,163 @@
+import os
+from contextlib import contextmanager
+from sqlalchemy import Column, Integer, MetaData, Table, inspect, select, text
+from sqlalchemy.exc import DBAPIError, OperationalError, ProgrammingError
+from database import Base, TodoTombstone, TodoVersion
+from search import setup_search
+from changes import setup_versions
+from dotenv import load_dotenv
+# Load environment variables from .env
+load_dotenv()
+
+# Schema versioning. The schema_version table holds one row with the version
+# the database is at; every step below moves it up by one. At startup a worker
+# reads that row and only runs DDL when it is behind. All steps are idempotent,
+# so databases created by the old create_all-on-import start at version 0 and
+# upgrade in place.
+#
+#   python migrations.py      bring the database up to date without serving
+#
+# With SchemaAutoMigrate=false workers never run DDL and refuse to start
+# against an old schema; run the command above as a deploy step instead.
+
+# Todos created before ownership existed have no owner and are visible to
+# nobody. Set this to a users.id to hand them all to that user.
+LEGACY_TODO_OWNER_ID = os.environ.get("LegacyTodoOwnerId")
+SchemaAutoMigrate = os.environ.get("SchemaAutoMigrate")
+
+SCHEMA_AUTO_MIGRATE = (SchemaAutoMigrate or "true").lower() in ("1", "true", "yes")
+
+metadata = MetaData()
+schema_version = Table("schema_version", metadata, Column("version", Integer, nullable=False))
+
+# The PostgreSQL advisory lock that lets one worker at a time migrate: any
+# number works as long as every worker uses the same one ("todo" in ASCII)
+MIGRATION_LOCK_ID = 0x746F646F
+
+def table_columns(engine, table: str):
+    return {column["name"] for column in inspect(engine).get_columns(table)}
+
+def create_tables(engine):
+    Base.metadata.create_all(engine)
+
+def migrate_todo_owners(engine):
+    # create_all only creates missing tables, so databases from before
+    # ownership need the column and index added in place
+    columns = table_columns(engine, "todos")
+    with engine.begin() as connection:
+        if "owner_id" not in columns:
+            connection.execute(text("ALTER TABLE todos ADD COLUMN owner_id INTEGER REFERENCES users (id)"))
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_todos_owner_id_id ON todos (owner_id, id)"))
+
+def assign_legacy_todos(engine, legacy_owner_id=None):
+    # Not a versioned step: the owner may be chosen long after the schema is
+    # up to date, so this runs on every migrate / startup while it is set
+    legacy_owner_id = legacy_owner_id or LEGACY_TODO_OWNER_ID
+    if legacy_owner_id:
+        with engine.begin() as connection:
+            connection.execute(text("UPDATE todos SET owner_id = :owner_id WHERE owner_id IS NULL"),
+                               {"owner_id": int(legacy_owner_id)})
+
+def add_todo_versions(engine):
+    # Delta sync: a version and updated-at on every todo, plus the tombstone
+    # and version counter tables. Existing rows get their id as version, so
+    # versions stay unique, and the counter continues after the largest.
+    Base.metadata.create_all(engine, tables=[TodoTombstone.__table__, TodoVersion.__table__])
+    columns = table_columns(engine, "todos")
+    with engine.begin() as connection:
+        if "version" not in columns:
+            connection.execute(text("ALTER TABLE todos ADD COLUMN version INTEGER"))
+        if "updated_at" not in columns:
+            connection.execute(text("ALTER TABLE todos ADD COLUMN updated_at TIMESTAMP"))
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_todos_owner_id_version ON todos (owner_id, version)"))
+        connection.execute(text("UPDATE todos SET version = id WHERE version IS NULL"))
+        connection.execute(text(
+            "INSERT INTO todo_version (id, value) SELECT 1, (SELECT coalesce(max(version), 0) FROM todos) "
+            "WHERE NOT EXISTS (SELECT 1 FROM todo_version)"))
+
+def add_version_triggers(engine):
+    # Versions and tombstones move into triggers (see changes.py); the FTS
+    # update trigger is recreated to skip updates that only stamp a version
+    setup_search(engine)
+    setup_versions(engine)
+
+# Append only: a step's position is its version
+MIGRATIONS = [
+    create_tables,
+    migrate_todo_owners,
+    setup_search,
+    add_todo_versions,
+    add_version_triggers,
+]
+LATEST_VERSION = len(MIGRATIONS)
+
+def current_version(engine):
+    # One round trip on an up-to-date database. Only a missing schema_version
+    # table means version 0: a database that cannot be reached raises, rather
+    # than passing for an empty one that needs DDL
+    with engine.connect() as connection:
+        try:
+            return connection.execute(select(schema_version.c.version)).scalar() or 0
+        except (OperationalError, ProgrammingError):
+            connection.rollback()
+            if inspect(connection).has_table("schema_version"):
+                raise
+            return 0
+
+@contextmanager
+def migration_lock(engine):
+    # PostgreSQL: workers starting together migrate one at a time; the rest
+    # wait, then find the schema up to date. The lock belongs to the
+    # connection, so it outlives the commit that ends the transaction.
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        connection.commit()
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+            connection.commit()
+
+def run_step(step, engine):
+    try:
+        step(engine)
+    except DBAPIError:
+        if engine.dialect.name == "postgresql":
+            raise
+        # No lock elsewhere: another worker may have made the same change
+        # between this step's check and its DDL. Steps are idempotent, so a
+        # second run skips what is already there.
+        step(engine)
+
+def migrate(engine):
+    with migration_lock(engine):
+        # Read under the lock, so a worker that waited does not migrate again
+        version = current_version(engine)
+        for step in MIGRATIONS[version:]:
+            run_step(step, engine)
+        if version < LATEST_VERSION:
+            metadata.create_all(engine)
+            with engine.begin() as connection:
+                connection.execute(schema_version.delete())
+                connection.execute(schema_version.insert().values(version=LATEST_VERSION))
+        assign_legacy_todos(engine)
+    return version
+
+def ensure_schema(engine, auto_migrate: bool = SCHEMA_AUTO_MIGRATE):
+    # Returns the version the database was at before any migration
+    version = current_version(engine)
+    if version >= LATEST_VERSION:
+        assign_legacy_todos(engine)
+        return version
+    if not auto_migrate:
+        raise RuntimeError(f"Database schema is at version {version}, this code needs {LATEST_VERSION}. "
+                           "Run `python migrations.py` first.")
+    return migrate(engine)
+
+if __name__ == "__main__":
+    from database import get_engine
+    previous = migrate(get_engine())
+    print(f"schema version {previous} -> {LATEST_VERSION}")
@@ -0,0 +1,36 @@
+import base64
+from fastapi import HTTPException
+from starlette import status
+
+# Keyset pagination over the Todo.id primary key. The cursor is opaque to
+# clients: it is the last id of the previous page, base64url encoded.
+
+# The largest page a listing or search may ask for
+MAX_PAGE_SIZE = 1000
+
+# A cursor id outside the signed 64-bit range overflows the database driver
+# (a 500) rather than matching no rows, so it is rejected like any bad cursor
+MIN_CURSOR_ID = -2 ** 63
+MAX_CURSOR_ID = 2 ** 63 - 1
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    # An empty cursor starts from the first page
+    if not cursor:
+        return None
+    try:
+        after_id = int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except ValueError:
+        after_id = None
+    if after_id is None or not MIN_CURSOR_ID <= after_id <= MAX_CURSOR_ID:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return after_id
+
+def keyset_page(todos, limit: int):
+    # Callers fetch limit + 1 rows; the extra row only tells us there is a next page
+    has_more = len(todos) > limit
+    todos = todos[:limit]
+    next_cursor = encode_cursor(todos[-1]["id"]) if has_more else None
+    return {"todos": todos, "next_cursor": next_cursor}
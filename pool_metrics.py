@@ -0,0 +1,116 @@
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from metrics import add_pool_wait
+
+# Connection pool instrumentation. Pool events count checkouts, checkins,
+# new connections and invalidations; the queue pools below also time how long
+# a checkout had to wait because every connection (overflow included) was busy.
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pool = None
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.overflow_max = 0
+
+    def record_wait(self, seconds: float, timed_out: bool):
+        add_pool_wait(seconds)
+        with self._lock:
+            self.waits += 1
+            self.timeouts += timed_out
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def snapshot(self):
+        pool = self.pool
+        metrics = {
+            "pool": type(pool).__name__ if pool is not None else None,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "waits": self.waits,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": self.wait_seconds_total,
+            "wait_seconds_avg": self.wait_seconds_total / self.waits if self.waits else 0.0,
+            "wait_seconds_max": self.wait_seconds_max,
+            "overflow_max": self.overflow_max,
+        }
+        if isinstance(pool, QueuePool):
+            metrics.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                # overflow() counts up from -size while the pool is still filling
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+                "timeout": pool.timeout(),
+            })
+        return metrics
+
+class _WaitTimingMixin:
+    metrics: PoolMetrics = None
+
+    def _do_get(self):
+        # Same test QueuePool uses to decide it must block on the queue
+        will_wait = (self.metrics is not None and self._max_overflow > -1
+                     and self._overflow >= self._max_overflow and self.checkedin() == 0)
+        if not will_wait:
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            self.metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record_wait(time.perf_counter() - start, timed_out=False)
+        return connection
+
+class InstrumentedQueuePool(_WaitTimingMixin, QueuePool):
+    pass
+
+class InstrumentedAsyncAdaptedQueuePool(_WaitTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+def instrumented_pool_class(url):
+    # Swap in the timing subclass only where the dialect would use a queue
+    # pool anyway (not e.g. SingletonThreadPool for in-memory SQLite)
+    pool_class = url.get_dialect().get_pool_class(url)
+    if issubclass(pool_class, AsyncAdaptedQueuePool):
+        return InstrumentedAsyncAdaptedQueuePool
+    if issubclass(pool_class, QueuePool):
+        return InstrumentedQueuePool
+    return None
+
+def instrument(engine, metrics: PoolMetrics):
+    pool = engine.pool
+    metrics.pool = pool
+    if isinstance(pool, _WaitTimingMixin):
+        pool.metrics = metrics
+
+    @event.listens_for(pool, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.connects += 1
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.checkouts += 1
+        if isinstance(pool, QueuePool):
+            metrics.overflow_max = max(metrics.overflow_max, pool.overflow())
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        metrics.checkins += 1
+
+    @event.listens_for(pool, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.invalidations += 1
@@ -0,0 +1,166 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Opt-in query diagnostics (QueryDiagnostics=1):
+#   - statements slower than SlowQueryThreshold seconds are logged with their
+#     parameters and the route that ran them, and with SlowQueryExplain=1 their
+#     query plan as well
+#   - a request that runs the same statement shape more than NPlusOneThreshold
+#     times is logged as a likely N+1
+# Everything goes to the "todo_app.queries" logger. When off, no hooks are
+# installed and nothing is paid per statement.
+load_dotenv()
+
+QueryDiagnostics = os.environ.get("QueryDiagnostics")
+SlowQueryThreshold = os.environ.get("SlowQueryThreshold")
+NPlusOneThreshold = os.environ.get("NPlusOneThreshold")
+SlowQueryExplain = os.environ.get("SlowQueryExplain")
+
+logger = logging.getLogger("todo_app.queries")
+
+PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+|\$\d+)"
+PLACEHOLDER_LIST = re.compile(rf"\(\s*{PLACEHOLDER}(?:\s*,\s*{PLACEHOLDER})+\s*\)")
+WHITESPACE = re.compile(r"\s+")
+
+def statement_shape(statement: str):
+    # Expanded IN lists render one placeholder per value; fold them so
+    # "IN (?, ?)" and "IN (?, ?, ?)" count as the same statement
+    return PLACEHOLDER_LIST.sub("(?)", WHITESPACE.sub(" ", statement).strip())
+
+class RequestQueries:
+    __slots__ = ("scope", "shapes")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.shapes = Counter()
+
+    @property
+    def route(self):
+        route = self.scope.get("route")
+        return f'{self.scope["method"]} {getattr(route, "path", self.scope["path"])}'
+
+current_queries = ContextVar("current_queries", default=None)
+
+class QueryDiagnosticsState:
+    def __init__(self, slow_threshold: float = 0.1, repeat_threshold: int = 10, explain: bool = False):
+        self.slow_threshold = slow_threshold
+        self.repeat_threshold = repeat_threshold
+        self.explain = explain
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.slow_queries = 0
+        self.n_plus_one_requests = 0
+
+    def enable(self):
+        if self.enabled:
+            return
+        event.listen(Engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", self.after_cursor_execute)
+        event.listen(Engine, "handle_error", self.handle_error)
+        self.enabled = True
+
+    def disable(self):
+        if not self.enabled:
+            return
+        event.remove(Engine, "before_cursor_execute", self.before_cursor_execute)
+        event.remove(Engine, "after_cursor_execute", self.after_cursor_execute)
+        event.remove(Engine, "handle_error", self.handle_error)
+        self.enabled = False
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("diagnostics_start", []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("diagnostics_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        queries = current_queries.get()
+        if queries is not None:
+            queries.shapes[statement_shape(statement)] += 1
+        if elapsed >= self.slow_threshold:
+            with self._lock:
+                self.slow_queries += 1
+            route = queries.route if queries is not None else "-"
+            logger.warning("slow query (%.3fs) on %s: %s params=%r", elapsed, route, statement, parameters)
+            if self.explain and not executemany:
+                self.log_plan(conn, statement, parameters)
+
+    def handle_error(self, exception_context):
+        # A failed statement never reaches after_cursor_execute; without this
+        # the next statement on the connection would be timed from its start
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("diagnostics_start"):
+            connection.info["diagnostics_start"].pop()
+
+    def log_plan(self, conn, statement, parameters):
+        # A separate DBAPI cursor keeps the plan query out of these hooks and
+        # off the statement's own result
+        if conn.dialect.name == "sqlite":
+            prefix = "EXPLAIN QUERY PLAN "
+        elif conn.dialect.name in ("postgresql", "mysql", "mariadb"):
+            prefix = "EXPLAIN "
+        else:
+            return
+        try:
+            cursor = conn.connection.dbapi_connection.cursor()
+            try:
+                cursor.execute(prefix + statement, parameters)
+                plan = cursor.fetchall()
+            finally:
+                cursor.close()
+        except Exception as exc:
+            logger.info("could not explain slow query: %s", exc)
+            return
+        logger.warning("plan: %s", "\n".join(" ".join(str(column) for column in row) for row in plan))
+
+    def finish_request(self, queries: RequestQueries):
+        repeated = [(shape, count) for shape, count in queries.shapes.items() if count > self.repeat_threshold]
+        if not repeated:
+            return
+        with self._lock:
+            self.n_plus_one_requests += 1
+        for shape, count in repeated:
+            logger.warning("possible N+1 on %s: statement ran %d times: %s", queries.route, count, shape)
+
+    def metrics(self):
+        return {
+            "enabled": self.enabled,
+            "slow_threshold_seconds": self.slow_threshold,
+            "repeat_threshold": self.repeat_threshold,
+            "slow_queries": self.slow_queries,
+            "n_plus_one_requests": self.n_plus_one_requests,
+        }
+
+query_diagnostics = QueryDiagnosticsState(
+    slow_threshold=float(SlowQueryThreshold) if SlowQueryThreshold else 0.1,
+    repeat_threshold=int(NPlusOneThreshold) if NPlusOneThreshold else 10,
+    explain=(SlowQueryExplain or "").lower() in ("1", "true", "yes"),
+)
+if (QueryDiagnostics or "").lower() in ("1", "true", "yes"):
+    query_diagnostics.enable()
+
+class QueryDiagnosticsMiddleware:
+    def __init__(self, app, diagnostics: QueryDiagnosticsState = query_diagnostics):
+        self.app = app
+        self.diagnostics = diagnostics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.diagnostics.enabled:
+            await self.app(scope, receive, send)
+            return
+        queries = RequestQueries(scope)
+        token = current_queries.set(queries)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_queries.reset(token)
+            self.diagnostics.finish_request(queries)
@@ -0,0 +1,84 @@
+import itertools
+import threading
+import time
+from sqlalchemy import event, text
+
+# Read replicas for GET traffic. Replicas are picked round-robin; one that
+# fails a health check (a SELECT 1, at most every check_interval seconds) or
+# drops a connection is skipped until a later check passes. With no healthy
+# replica, reads go to the primary. Checks run on a background thread, one at
+# a time per replica, so a request never waits on a slow or unreachable
+# replica; a replica only takes reads once its first check has passed.
+
+class Replica:
+    def __init__(self, engine):
+        self.engine = engine
+        self.healthy = False
+        self.checked_at = 0.0
+        self.checking = None
+        self.reads = 0
+
+class ReplicaRouter:
+    def __init__(self, engines, check_interval: float = 5.0):
+        self.replicas = [Replica(engine) for engine in engines]
+        self.check_interval = check_interval
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self.primary_fallbacks = 0
+        for replica in self.replicas:
+            self._watch(replica)
+
+    def _watch(self, replica: Replica):
+        @event.listens_for(replica.engine, "handle_error")
+        def on_error(exception_context):
+            if exception_context.is_disconnect:
+                replica.healthy = False
+                replica.checked_at = time.monotonic()
+
+    def check(self, replica: Replica):
+        try:
+            with replica.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            replica.healthy = True
+        except Exception:
+            replica.healthy = False
+        replica.checked_at = time.monotonic()
+        return replica.healthy
+
+    def _check_in_background(self, replica: Replica):
+        with self._lock:
+            if replica.checking is not None and replica.checking.is_alive():
+                return
+            replica.checking = threading.Thread(target=self.check, args=(replica,), daemon=True)
+            replica.checking.start()
+
+    def check_all(self):
+        # Synchronous; for startup scripts and tests
+        for replica in self.replicas:
+            self.check(replica)
+
+    def is_replica(self, bind):
+        return any(replica.engine is bind for replica in self.replicas)
+
+    def pick(self):
+        # Returns a replica engine, or None to read from the primary
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._next) % len(self.replicas)]
+            if time.monotonic() - replica.checked_at >= self.check_interval:
+                self._check_in_background(replica)
+            if replica.healthy:
+                with self._lock:
+                    replica.reads += 1
+                return replica.engine
+        if self.replicas:
+            with self._lock:
+                self.primary_fallbacks += 1
+        return None
+
+    def metrics(self):
+        return {
+            "replicas": len(self.replicas),
+            "healthy": sum(replica.healthy for replica in self.replicas),
+            "replica_reads": sum(replica.reads for replica in self.replicas),
+            "primary_fallbacks": self.primary_fallbacks,
+        }
@@ -0,0 +1,38 @@
+from typing import List, Optional
+from pydantic import BaseModel, ConfigDict
+
+class TodoCreate(BaseModel):
+    id : int
+    title: str
+    description: str = None
+
+class TodoUpdate(BaseModel):
+    todo_id: int
+    title: str
+    description: str = None
+
+# Response models. Declaring them lets FastAPI serialize straight to JSON
+# bytes in pydantic-core instead of walking the result with jsonable_encoder.
+class TodoOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    title: Optional[str] = None
+    description: Optional[str] = None
+
+class TodoPage(BaseModel):
+    todos: List[TodoOut]
+    next_cursor: Optional[str] = None
+
+class TodoChange(TodoOut):
+    version: int
+
+class DeletedTodo(BaseModel):
+    id: int
+    version: int
+
+class TodoChanges(BaseModel):
+    todos: List[TodoChange]
+    deleted: List[DeletedTodo]
+    version: int
+    has_more: bool
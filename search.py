@@ -0,0 +1,84 @@
+import re
+from sqlalchemy import text, or_
+from sqlalchemy.orm import Session
+from database import Todo
+
+# Full-text search over todo title and description.
+#   SQLite: an external-content FTS5 table kept in sync by triggers, ranked by bm25
+#   PostgreSQL: a stored tsvector column with a GIN index, ranked by ts_rank_cd
+# Any other dialect falls back to a case-insensitive substring scan.
+# Title matches rank above description matches on both.
+
+SQLITE_SETUP = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS todos_fts USING fts5(title, description, content='todos', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS todos_fts_insert AFTER INSERT ON todos BEGIN
+        INSERT INTO todos_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS todos_fts_delete AFTER DELETE ON todos BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    # Only the indexed columns, so stamping a version (changes.py) does not reindex the row
+    "DROP TRIGGER IF EXISTS todos_fts_update",
+    """CREATE TRIGGER todos_fts_update AFTER UPDATE OF title, description ON todos BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO todos_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+]
+
+POSTGRESQL_SETUP = [
+    """ALTER TABLE todos ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_todos_search_vector ON todos USING GIN (search_vector)",
+]
+
+def setup_search(engine):
+    with engine.begin() as connection:
+        # The old B-tree index on description helped no search and slowed every write
+        connection.execute(text("DROP INDEX IF EXISTS ix_todos_description"))
+        if engine.dialect.name == "sqlite":
+            created = connection.execute(text(
+                "SELECT count(*) FROM sqlite_master WHERE name = 'todos_fts'")).scalar() == 0
+            for statement in SQLITE_SETUP:
+                connection.execute(text(statement))
+            if created:
+                # Index the rows that were there before the triggers
+                connection.execute(text("INSERT INTO todos_fts(todos_fts) VALUES ('rebuild')"))
+        elif engine.dialect.name == "postgresql":
+            for statement in POSTGRESQL_SETUP:
+                connection.execute(text(statement))
+
+def fts5_query(q: str):
+    # Every word must match; the last one as a prefix so search-as-you-type works.
+    # Quoting keeps user input from being read as FTS5 syntax.
+    terms = re.findall(r"\w+", q)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"' for term in terms) + "*"
+
+def search_todos(db: Session, owner_id: int, q: str, skip: int = 0, limit: int = 10):
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        match = fts5_query(q)
+        if match is None:
+            return []
+        rows = db.execute(text(
+            "SELECT todos.id, todos.title, todos.description FROM todos_fts "
+            "JOIN todos ON todos.id = todos_fts.rowid "
+            "WHERE todos_fts MATCH :match AND todos.owner_id = :owner_id "
+            "ORDER BY bm25(todos_fts, 10.0, 1.0) LIMIT :limit OFFSET :skip"
+        ), {"match": match, "owner_id": owner_id, "limit": limit, "skip": skip})
+    elif dialect == "postgresql":
+        rows = db.execute(text(
+            "SELECT id, title, description FROM todos, websearch_to_tsquery('english', :q) AS query "
+            "WHERE search_vector @@ query AND owner_id = :owner_id "
+            "ORDER BY ts_rank_cd(search_vector, query) DESC, id LIMIT :limit OFFSET :skip"
+        ), {"q": q, "owner_id": owner_id, "limit": limit, "skip": skip})
+    else:
+        pattern = f"%{q}%"
+        rows = db.query(Todo.id, Todo.title, Todo.description).filter(
+            Todo.owner_id == owner_id,
+            or_(Todo.title.ilike(pattern), Todo.description.ilike(pattern))
+        ).order_by(Todo.id).offset(skip).limit(limit)
+    return [{"id": row.id, "title": row.title, "description": row.description} for row in rows]
@@ -0,0 +1,36 @@
+import asyncio
+from change_feed import ChangeHub
+from todos_feed import sse_events
+
+def test_events_reach_only_the_owners_subscribers():
+    async def run():
+        hub = ChangeHub()
+        mine = hub.subscribe(1)
+        theirs = hub.subscribe(2)
+        hub.publish(1, "created", {"id": 1, "title": "a", "description": None})
+        hub.publish(1, "deleted", {"id": 1})
+        assert (await mine.get(1))["action"] == "created"
+        assert (await mine.get(1))["todo"] == {"id": 1}
+        try:
+            await theirs.get(0.05)
+            assert False, "owner 2 saw owner 1's event"
+        except asyncio.TimeoutError:
+            pass
+        hub.unsubscribe(mine)
+        hub.unsubscribe(theirs)
+        assert hub.metrics()["subscribers"] == 0
+
+    asyncio.run(run())
+
+def test_slow_subscriber_is_dropped_without_blocking_the_writer():
+    async def run():
+        hub = ChangeHub(buffer_size=3)
+        slow = hub.subscribe(1)
+        # Writers publish from the thread pool; none of these may wait on the reader
+        await asyncio.to_thread(lambda: [hub.publish(1, "updated", {"id": i}) for i in range(10)])
+        await asyncio.sleep(0)
+        events = [chunk async for chunk in sse_events(slow)]
+        assert events == ["event: dropped\ndata: {}\n\n"]
+        assert hub.metrics() == {"subscribers": 0, "published": 10, "delivered": 3, "dropped": 1}
+
+    asyncio.run(run())
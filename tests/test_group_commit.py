@@ -0,0 +1,33 @@
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.exc import IntegrityError
+from database import Base, Todo
+from group_commit import GroupCommitter
+
+@pytest.fixture
+def bind(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'group.db'}")
+    Base.metadata.create_all(engine)
+    return engine
+
+def test_concurrent_creates_share_one_commit(bind):
+    committer = GroupCommitter(bind, window=0.2, max_batch=10)
+    futures = [committer.submit({"id": i, "title": f"todo {i}", "description": None, "owner_id": 1}) for i in range(1, 11)]
+
+    assert [future.result(timeout=5)["id"] for future in futures] == list(range(1, 11))
+    assert committer.batches == 1
+    assert committer.largest_batch == 10
+    with bind.connect() as connection:
+        assert connection.execute(select(func.count()).select_from(Todo)).scalar() == 10
+
+def test_conflicting_row_only_fails_its_caller(bind):
+    committer = GroupCommitter(bind, window=0.2, max_batch=3)
+    committer.insert({"id": 1, "title": "existing", "description": None, "owner_id": 1})
+    futures = [committer.submit({"id": i, "title": f"todo {i}", "description": None, "owner_id": 1}) for i in (2, 1, 3)]
+
+    assert futures[0].result(timeout=5)["id"] == 2
+    with pytest.raises(IntegrityError):
+        futures[1].result(timeout=5)
+    assert futures[2].result(timeout=5)["id"] == 3
+    with bind.connect() as connection:
+        assert connection.execute(select(func.count()).select_from(Todo)).scalar() == 3
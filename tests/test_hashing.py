@@ -0,0 +1,31 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from Jwt.hashing import PasswordHasher
+
+def test_hash_and_verify():
+    hasher = PasswordHasher("thread", workers=2, queue_size=2)
+
+    async def run():
+        hashed = await hasher.hash("testpassword")
+        return hashed, await hasher.verify("testpassword", hashed), await hasher.verify("wrong", hashed)
+
+    hashed, valid, invalid = asyncio.run(run())
+    assert hashed != "testpassword"
+    assert valid is True
+    assert invalid is False
+    assert hasher.metrics()["completed"] == 3
+    assert hasher.metrics()["hash_seconds_avg"] > 0
+
+def test_full_queue_returns_503():
+    hasher = PasswordHasher("thread", workers=1, queue_size=0)
+
+    async def run():
+        return await asyncio.gather(hasher.hash("one"), hasher.hash("two"), return_exceptions=True)
+
+    results = asyncio.run(run())
+    errors = [result for result in results if isinstance(result, HTTPException)]
+    assert len(errors) == 1
+    assert errors[0].status_code == 503
+    assert hasher.metrics()["rejected"] == 1
+    assert hasher.metrics()["queue_depth"] == 0
@@ -0,0 +1,94 @@
+from listing_cache import ListingCache, MemoryCacheBackend
+
+def page(*ids):
+    return [{"id": todo_id, "title": f"Todo {todo_id}", "description": None} for todo_id in ids]
+
+def make_cache():
+    cache = ListingCache(MemoryCacheBackend(max_size=100, ttl=60))
+    generation = cache.generation(1)
+    # Two full offset pages and a short last one
+    cache.set_offset(1, 0, 2, page(1, 2), "etag", generation)
+    cache.set_offset(1, 2, 2, page(3, 4), "etag", generation)
+    cache.set_offset(1, 4, 2, page(5), "etag", generation)
+    # Keyset pages after id 2 (full) and after id 4 (last page)
+    cache.set_keyset(1, 2, 2, {"todos": page(3, 4), "next_cursor": "NA"}, "etag", generation)
+    cache.set_keyset(1, 4, 2, {"todos": page(5), "next_cursor": None}, "etag", generation)
+    return cache
+
+def test_update_drops_only_the_page_showing_the_row():
+    cache = make_cache()
+    cache.invalidate(1, [3], shifts=False)
+    assert cache.get_offset(1, 0, 2) is not None
+    assert cache.get_offset(1, 2, 2) is None
+    assert cache.get_offset(1, 4, 2) is not None
+    assert cache.get_keyset(1, 2, 2) is None
+    assert cache.get_keyset(1, 4, 2) is not None
+
+def test_insert_drops_the_pages_it_shifts():
+    cache = make_cache()
+    cache.invalidate(1, [4], shifts=True)
+    # Offset pages from the changed row onwards move
+    assert cache.get_offset(1, 0, 2) is not None
+    assert cache.get_offset(1, 2, 2) is None
+    assert cache.get_offset(1, 4, 2) is None
+    # Keyset pages only change if the row falls inside them
+    assert cache.get_keyset(1, 2, 2) is None
+    assert cache.get_keyset(1, 4, 2) is not None
+
+def test_append_only_drops_open_pages():
+    cache = make_cache()
+    cache.invalidate(1, [100], shifts=True)
+    assert cache.get_offset(1, 2, 2) is not None
+    assert cache.get_offset(1, 4, 2) is None
+    assert cache.get_keyset(1, 2, 2) is not None
+    assert cache.get_keyset(1, 4, 2) is None
+
+def test_other_owners_pages_are_kept():
+    cache = make_cache()
+    cache.invalidate(2, [3], shifts=True)
+    assert cache.get_offset(1, 2, 2) is not None
+    assert cache.get_keyset(1, 2, 2) is not None
+
+def test_page_read_during_a_write_is_not_cached():
+    cache = ListingCache(MemoryCacheBackend(max_size=100, ttl=60))
+    generation = cache.generation(1)
+    cache.invalidate(1, [1], shifts=True)
+    cache.set_offset(1, 0, 2, page(1, 2), "etag", generation)
+    assert cache.get_offset(1, 0, 2) is None
+
+def test_invalidation_only_reads_the_owners_pages():
+    backend = MemoryCacheBackend(max_size=100, ttl=60)
+    cache = ListingCache(backend)
+    for owner_id in range(2, 50):
+        cache.set_offset(owner_id, 0, 2, page(1, 2), "etag", cache.generation(owner_id))
+    cache.set_offset(1, 0, 2, page(1, 2), "etag", cache.generation(1))
+    scanned = []
+    pages = backend.pages
+    backend.pages = lambda owner_id: scanned.extend(pages(owner_id)) or pages(owner_id)
+    cache.invalidate(1, [1], shifts=True)
+    assert [key for key, _ in scanned] == ["offset:0:2"]
+    assert cache.get_offset(1, 0, 2) is None
+    assert cache.get_offset(2, 0, 2) is not None
+
+def test_a_write_in_another_worker_stops_a_stale_page_being_cached():
+    # Two workers sharing one backend
+    backend = MemoryCacheBackend(max_size=100, ttl=60)
+    reader, writer = ListingCache(backend), ListingCache(backend)
+    generation = reader.generation(1)
+    other_owner = reader.generation(2)
+    writer.invalidate(1, [1], shifts=True)
+    reader.set_offset(1, 0, 2, page(1, 2), "etag", generation)
+    reader.set_offset(2, 0, 2, page(3), "etag", other_owner)
+    assert reader.get_offset(1, 0, 2) is None
+    # Writes to one owner do not hold back another owner's pages
+    assert reader.get_offset(2, 0, 2) is not None
+
+def test_stats():
+    cache = make_cache()
+    cache.get_offset(1, 0, 2)
+    cache.get_offset(1, 10, 2)
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+    assert ListingCache(MemoryCacheBackend(max_size=1, ttl=60)).stats()["evictions"] == 0
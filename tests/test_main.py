@@ -1,10 +1,16 @@
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+import pytest
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from database import Base, Todo
 from Jwt.auth import create_access_token
 from main import app, get_db
+from search import setup_search
+from changes import setup_versions
 from datetime import timedelta
+import csv
+import io
+import json
 from dotenv import load_dotenv
 import os
 
@@ -16,6 +22,8 @@ TEST_DATABASE_URL = os.environ.get("TestDatabaseConnectionString")
 engine = create_engine(TEST_DATABASE_URL)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base.metadata.create_all(bind=engine)
+setup_search(engine)
+setup_versions(engine)
 
 # Override dependency to use the test database
 def get_test_db():
@@ -30,6 +38,9 @@ app.dependency_overrides[get_db] = get_test_db
 
 client = TestClient(app)
 
+# An authenticated client for the endpoints that only show the caller's todos
+user_client = TestClient(app, headers={"Authorization": f"Bearer {create_access_token('testuser', 1, timedelta(minutes=20))}"})
+
 def test_create_todo():
     todo_data = {"title": "Test Todo", "description": "Test Description"}
 
@@ -97,3 +108,338 @@ def test_delete_todo():
     )
     assert response_delete.status_code == 200
     assert response_delete.json()["message"] == "Todo deleted"
+
+def test_read_todos_cursor():
+    # Create a user for authentication
+    access_token = create_access_token("testuser", 1, timedelta(minutes=20))
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    for todo_id in range(101, 106):
+        user_client.post("/todos", json={"id": todo_id, "title": f"Cursor Todo {todo_id}"}, headers=headers)
+
+    # Walk every page and collect the ids
+    seen = []
+    cursor = ""
+    while cursor is not None:
+        response = user_client.get("/todos", params={"cursor": cursor, "limit": 2}, headers=headers)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["todos"]) <= 2
+        seen.extend(todo["id"] for todo in page["todos"])
+        cursor = page["next_cursor"]
+
+    assert seen == sorted(seen)
+    assert [101, 102, 103, 104, 105] == [todo_id for todo_id in seen if 101 <= todo_id <= 105]
+
+    # The offset mode keeps working for existing clients
+    response = user_client.get("/todos", params={"skip": 0, "limit": 2}, headers=headers)
+    assert isinstance(response.json(), list)
+
+def test_read_todos_invalid_cursor():
+    response = user_client.get("/todos", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    from pagination import encode_cursor
+    for after_id in (10 ** 30, 2 ** 63, -2 ** 63 - 1):
+        assert user_client.get("/todos", params={"cursor": encode_cursor(after_id)}).status_code == 400
+    assert user_client.get("/todos", params={"cursor": encode_cursor(2 ** 63 - 1)}).json()["todos"] == []
+
+def test_out_of_range_limits_are_rejected():
+    for limit in [0, -5, 1001]:
+        assert user_client.get("/todos", params={"cursor": "", "limit": limit}).status_code == 422
+        assert user_client.get("/todos", params={"limit": limit}).status_code == 422
+        assert user_client.get("/todos/search", params={"q": "todo", "limit": limit}).status_code == 422
+    assert user_client.get("/todos", params={"skip": -1}).status_code == 422
+
+def test_batch_todos():
+    # Create a user for authentication
+    access_token = create_access_token("testuser", 1, timedelta(minutes=20))
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    # Item 201 is sent twice, so its second copy conflicts
+    todos = [{"id": 201, "title": "Batch 1"}, {"id": 202, "title": "Batch 2"}, {"id": 201, "title": "Batch 1 again"}]
+    response_create = user_client.post("/todos/batch", json=todos, headers=headers)
+    assert response_create.status_code == 200
+    assert [item["status"] for item in response_create.json()["results"]] == [201, 201, 409]
+
+    updates = [{"todo_id": 202, "title": "Batch 2 updated"}, {"todo_id": 299, "title": "Missing"}]
+    response_update = user_client.put("/todos/batch", json=updates, headers=headers)
+    assert [item["status"] for item in response_update.json()["results"]] == [200, 404]
+
+    response_read = user_client.get("/todos", params={"cursor": "", "limit": 1000}, headers=headers)
+    titles = {todo["id"]: todo["title"] for todo in response_read.json()["todos"]}
+    assert titles[201] == "Batch 1"
+    assert titles[202] == "Batch 2 updated"
+
+    response_delete = user_client.post("/todos/batch/delete", json=[201, 202, 299], headers=headers)
+    assert [item["status"] for item in response_delete.json()["results"]] == [200, 200, 404]
+
+def test_export_todos():
+    user_client.post("/todos/batch", json=[{"id": 301, "title": "Export 1", "description": "First"}, {"id": 302, "title": "Export, 2"}])
+
+    response_ndjson = user_client.get("/todos/export")
+    assert response_ndjson.status_code == 200
+    assert response_ndjson.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response_ndjson.text.splitlines()]
+    assert {"id": 301, "title": "Export 1", "description": "First"} in rows
+
+    response_csv = user_client.get("/todos/export", params={"format": "csv"})
+    assert response_csv.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response_csv.text)))
+    assert {"id": "302", "title": "Export, 2", "description": ""} in rows
+
+    user_client.post("/todos/batch/delete", json=[301, 302])
+
+def test_import_todos():
+    user_client.post("/todos/batch", json=[{"id": 401, "title": "Already there"}])
+
+    ndjson = "\n".join(json.dumps({"id": todo_id, "title": f"Import {todo_id}"}) for todo_id in range(401, 406))
+    response_ndjson = user_client.post("/todos/import", params={"chunk_size": 2}, content=ndjson,
+                                  headers={"Content-Type": "application/x-ndjson"})
+    assert response_ndjson.status_code == 200
+    assert response_ndjson.json()["inserted"] == 4
+    assert response_ndjson.json()["duplicate_ids"] == [401]
+
+    csv_body = 'id,title,description\n406,"Multi\nline",Imported\n407,Second,\nnot-an-id,Broken,\n'
+    response_csv = user_client.post("/todos/import", content=csv_body, headers={"Content-Type": "text/csv"})
+    assert response_csv.json()["inserted"] == 2
+    assert response_csv.json()["invalid"] == 1
+
+    response_read = user_client.get("/todos", params={"cursor": "", "limit": 1000})
+    titles = {todo["id"]: todo["title"] for todo in response_read.json()["todos"]}
+    assert titles[406] == "Multi\nline"
+
+    user_client.post("/todos/batch/delete", json=list(range(401, 408)))
+
+def test_listing_cache_invalidated_by_writes():
+    from listing_cache import listing_cache, MemoryCacheBackend
+    listing_cache.backend = MemoryCacheBackend(max_size=100, ttl=60)
+    try:
+        user_client.post("/todos", json={"id": 501, "title": "Cached"})
+        params = {"cursor": "", "limit": 1000}
+        assert "Cached" in [todo["title"] for todo in user_client.get("/todos", params=params).json()["todos"]]
+        user_client.get("/todos", params=params)
+        assert listing_cache.stats()["hits"] >= 1
+
+        user_client.put("/todos/501", json={"todo_id": 501, "title": "Cached and updated"})
+        assert "Cached and updated" in [todo["title"] for todo in user_client.get("/todos", params=params).json()["todos"]]
+
+        user_client.delete("/todos/501")
+        assert 501 not in [todo["id"] for todo in user_client.get("/todos", params=params).json()["todos"]]
+    finally:
+        listing_cache.backend = None
+
+def test_read_todo_with_etag():
+    user_client.post("/todos", json={"id": 601, "title": "Tagged"})
+
+    response = user_client.get("/todos/601")
+    assert response.status_code == 200
+    assert response.json()["title"] == "Tagged"
+    etag = response.headers["etag"]
+
+    response_unchanged = user_client.get("/todos/601", headers={"If-None-Match": etag})
+    assert response_unchanged.status_code == 304
+    assert response_unchanged.content == b""
+
+    user_client.put("/todos/601", json={"todo_id": 601, "title": "Tagged again"})
+    response_changed = user_client.get("/todos/601", headers={"If-None-Match": etag})
+    assert response_changed.status_code == 200
+    assert response_changed.headers["etag"] != etag
+
+    assert user_client.get("/todos/60100").status_code == 404
+    user_client.delete("/todos/601")
+
+def test_read_todos_etag():
+    response = user_client.get("/todos", params={"limit": 5})
+    assert user_client.get("/todos", params={"limit": 5}, headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+def test_search_todos():
+    user_client.post("/todos/batch", json=[
+        {"id": 701, "title": "Buy groceries", "description": "milk and eggs"},
+        {"id": 702, "title": "Call plumber", "description": "about the groceries delivery"},
+        {"id": 703, "title": "Walk the dog"},
+    ])
+
+    response = user_client.get("/todos/search", params={"q": "grocer"})
+    assert response.status_code == 200
+    # The title match ranks above the description match
+    assert [todo["id"] for todo in response.json()] == [701, 702]
+
+    user_client.put("/todos/703", json={"todo_id": 703, "title": "Walk the dog", "description": "then buy groceries"})
+    assert 703 in [todo["id"] for todo in user_client.get("/todos/search", params={"q": "groceries"}).json()]
+
+    user_client.delete("/todos/701")
+    assert 701 not in [todo["id"] for todo in user_client.get("/todos/search", params={"q": "groceries"}).json()]
+
+    # FTS5 syntax in the query is treated as plain words
+    assert user_client.get("/todos/search", params={"q": 'milk" OR "'}).status_code == 200
+    user_client.post("/todos/batch/delete", json=[702, 703])
+
+def test_todos_are_scoped_to_their_owner():
+    other_client = TestClient(app, headers={"Authorization": f"Bearer {create_access_token('otheruser', 2, timedelta(minutes=20))}"})
+    user_client.post("/todos", json={"id": 801, "title": "Mine"})
+
+    assert other_client.get("/todos/801").status_code == 404
+    assert other_client.put("/todos/801", json={"todo_id": 801, "title": "Theirs"}).status_code == 404
+    assert other_client.delete("/todos/801").status_code == 404
+    assert 801 not in [todo["id"] for todo in other_client.get("/todos", params={"limit": 1000}).json()]
+    assert user_client.get("/todos/801").json()["title"] == "Mine"
+
+    # Ids are global, so another user cannot reuse one
+    response = other_client.post("/todos/batch", json=[{"id": 801, "title": "Theirs"}])
+    assert response.json()["results"][0]["status"] == 409
+
+    assert client.get("/todos").status_code == 401
+    user_client.delete("/todos/801")
+
+def test_replica_reads_do_not_fill_the_listing_cache(monkeypatch):
+    import main
+    from listing_cache import ListingCache, MemoryCacheBackend
+    from replicas import ReplicaRouter
+    listing_cache = ListingCache(MemoryCacheBackend(max_size=100, ttl=60))
+    monkeypatch.setattr(main, "listing_cache", listing_cache)
+    # The test session's engine stands in for a replica
+    replicas = ReplicaRouter([engine])
+    monkeypatch.setattr(main, "read_replicas", replicas)
+    assert user_client.get("/todos", params={"skip": 0, "limit": 37}).status_code == 200
+    assert listing_cache.get_offset(1, 0, 37) is None
+    replicas.replicas = []
+    user_client.get("/todos", params={"skip": 0, "limit": 37})
+    assert listing_cache.get_offset(1, 0, 37) is not None
+
+def test_metrics_endpoint():
+    user_client.get("/todos", params={"limit": 3})
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'route="/todos"' in response.text
+    assert "http_request_sql_statements_total" in response.text
+
+    routes = {(item["method"], item["route"], item["status"]): item for item in client.get("/metrics/routes").json()}
+    assert routes[("GET", "/todos", 200)]["avg_statements"] > 0
+    assert routes[("GET", "/todos", 200)]["avg_auth_seconds"] > 0
+
+def test_websocket_streams_the_callers_changes():
+    token = create_access_token("testuser", 1, timedelta(minutes=20))
+    with user_client.websocket_connect(f"/todos/ws?token={token}") as websocket:
+        user_client.post("/todos", json={"id": 7301, "title": "Live", "description": "feed"})
+        user_client.put("/todos/7301", json={"todo_id": 7301, "title": "Live 2", "description": "feed"})
+        user_client.delete("/todos/7301")
+        assert websocket.receive_json() == {"action": "created", "todo": {"id": 7301, "title": "Live", "description": "feed"}}
+        assert websocket.receive_json()["todo"]["title"] == "Live 2"
+        assert websocket.receive_json() == {"action": "deleted", "todo": {"id": 7301}}
+
+def test_websocket_streams_batch_and_import_changes():
+    token = create_access_token("testuser", 1, timedelta(minutes=20))
+    with user_client.websocket_connect(f"/todos/ws?token={token}") as websocket:
+        user_client.post("/todos/batch", json=[{"id": 7311, "title": "Batch", "description": "feed"}])
+        user_client.put("/todos/batch", json=[{"todo_id": 7311, "title": "Batch 2", "description": "feed"}])
+        user_client.post("/todos/batch/delete", json=[7311])
+        user_client.post("/todos/import", content='{"id": 7312, "title": "Imported"}\n')
+        assert websocket.receive_json() == {"action": "created", "todo": {"id": 7311, "title": "Batch", "description": "feed"}}
+        assert websocket.receive_json() == {"action": "updated", "todo": {"id": 7311, "title": "Batch 2", "description": "feed"}}
+        assert websocket.receive_json() == {"action": "deleted", "todo": {"id": 7311}}
+        assert websocket.receive_json() == {"action": "created", "todo": {"id": 7312, "title": "Imported", "description": None}}
+    user_client.delete("/todos/7312")
+
+def test_websocket_needs_a_valid_token():
+    try:
+        with client.websocket_connect("/todos/ws?token=nope"):
+            assert False, "connected without a valid token"
+    except Exception as exc:
+        assert getattr(exc, "code", None) == 1008
+
+def test_changes_since_a_version():
+    since = user_client.get("/todos/changes").json()
+    while since["has_more"]:
+        since = user_client.get("/todos/changes", params={"since": since["version"]}).json()
+    version = since["version"]
+
+    user_client.post("/todos", json={"id": 7401, "title": "Synced", "description": "a"})
+    user_client.post("/todos", json={"id": 7402, "title": "Synced 2", "description": "b"})
+    user_client.put("/todos/7401", json={"todo_id": 7401, "title": "Synced again", "description": "a"})
+    user_client.delete("/todos/7402")
+
+    changes = user_client.get("/todos/changes", params={"since": version}).json()
+    assert [(todo["id"], todo["title"]) for todo in changes["todos"]] == [(7401, "Synced again")]
+    assert [deleted["id"] for deleted in changes["deleted"]] == [7402]
+    assert changes["version"] == changes["deleted"][0]["version"] > changes["todos"][0]["version"] > version
+    assert not changes["has_more"]
+
+    first = user_client.get("/todos/changes", params={"since": version, "limit": 1}).json()
+    assert first["todos"] == changes["todos"] and first["deleted"] == [] and first["has_more"]
+    assert user_client.get("/todos/changes", params={"since": changes["version"]}).json()["todos"] == []
+    assert user_client.get("/todos/changes", params={"since": -1}).status_code == 422
+
+def test_recreated_todo_supersedes_its_tombstone():
+    version = user_client.get("/todos/changes", params={"since": 0, "limit": 1000}).json()["version"]
+    user_client.post("/todos", json={"id": 7403, "title": "First", "description": "a"})
+    user_client.delete("/todos/7403")
+    user_client.post("/todos", json={"id": 7403, "title": "Again", "description": "b"})
+
+    for since in (0, version):
+        changes = user_client.get("/todos/changes", params={"since": since, "limit": 1000}).json()
+        assert [todo["title"] for todo in changes["todos"] if todo["id"] == 7403] == ["Again"]
+        assert [deleted for deleted in changes["deleted"] if deleted["id"] == 7403] == []
+    user_client.delete("/todos/7403")
+    changes = user_client.get("/todos/changes", params={"since": version}).json()
+    assert {deleted["id"] for deleted in changes["deleted"]} == {7403}
+    assert changes["todos"] == []
+
+def test_changes_query_uses_the_owner_version_index():
+    if engine.dialect.name != "sqlite":
+        pytest.skip("reads an SQLite query plan")
+    with engine.connect() as connection:
+        plan = connection.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM todos WHERE owner_id = 1 AND version > 5 ORDER BY version LIMIT 10")).all()
+    assert "ix_todos_owner_id_version" in " ".join(str(row) for row in plan)
+
+def count_statements(request):
+    from sqlalchemy import event
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        response = request()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return response, statements
+
+def test_each_write_is_one_statement():
+    # The version counter and tombstones are kept by triggers inside the write itself
+    response, statements = count_statements(lambda: user_client.post("/todos", json={"id": 7501, "title": "One", "description": "trip"}))
+    assert response.json() == {"id": 7501, "title": "One", "description": "trip"}
+    assert [statement.split()[0] for statement in statements] == ["INSERT"]
+
+    response, statements = count_statements(lambda: user_client.put("/todos/7501", json={"todo_id": 7501, "title": "Two", "description": "trips"}))
+    assert response.json() == {"id": 7501, "title": "Two", "description": "trips"}
+    assert [statement.split()[0] for statement in statements] == ["UPDATE"]
+
+    response, statements = count_statements(lambda: user_client.delete("/todos/7501"))
+    assert response.status_code == 200
+    assert [statement.split()[0] for statement in statements] == ["DELETE"]
+
+    with engine.connect() as connection:
+        versions = connection.execute(text("SELECT version FROM todo_tombstones WHERE id = 7501")).scalars().all()
+        counter = connection.execute(text("SELECT value FROM todo_version")).scalar_one()
+    assert versions == [counter]
+
+@pytest.mark.parametrize("group_commit", [False, True])
+def test_creating_an_existing_id_is_409(group_commit, monkeypatch):
+    import main
+    monkeypatch.setattr(main, "GROUP_COMMIT_ENABLED", group_commit)
+    other_client = TestClient(app, headers={"Authorization": f"Bearer {create_access_token('other', 2, timedelta(minutes=20))}"})
+    assert user_client.post("/todos", json={"id": 7503, "title": "Mine"}).status_code == 200
+    response = other_client.post("/todos", json={"id": 7503, "title": "Theirs"})
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Todo already exists"
+    assert user_client.get("/todos/7503").json()["title"] == "Mine"
+    user_client.delete("/todos/7503")
+
+def test_writes_to_missing_or_foreign_todos_are_404():
+    other_client = TestClient(app, headers={"Authorization": f"Bearer {create_access_token('other', 2, timedelta(minutes=20))}"})
+    user_client.post("/todos", json={"id": 7502, "title": "Mine", "description": "only"})
+    assert other_client.put("/todos/7502", json={"todo_id": 7502, "title": "Theirs"}).status_code == 404
+    assert other_client.delete("/todos/7502").status_code == 404
+    assert user_client.put("/todos/7599", json={"todo_id": 7599, "title": "Nobody"}).status_code == 404
+    assert user_client.delete("/todos/7599").status_code == 404
+    assert user_client.get("/todos/7502").json()["title"] == "Mine"
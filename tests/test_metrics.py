@@ -0,0 +1,25 @@
+from metrics import Histogram, MetricsRegistry, RequestStats
+
+def test_histogram_quantiles():
+    histogram = Histogram()
+    for value in [0.002] * 90 + [0.2] * 10:
+        histogram.observe(value)
+    assert histogram.count == 100
+    assert histogram.quantile(0.5) == 0.0025
+    assert histogram.quantile(0.99) == 0.25
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    stats = RequestStats()
+    stats.sql_seconds = 0.004
+    stats.statements = 2
+    registry.observe("GET", "/todos", 200, 0.01, stats)
+    registry.register_collector("listing_cache", lambda: {"hits": 3, "backend": "memory"})
+
+    text = registry.render()
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/todos",status="200",le="0.01"} 1' in text
+    assert 'http_request_duration_seconds_count{method="GET",route="/todos",status="200"} 1' in text
+    assert 'http_request_sql_statements_total{method="GET",route="/todos",status="200"} 2' in text
+    assert "todo_app_listing_cache_hits 3" in text
+    # Non-numeric values are not gauges
+    assert "backend" not in text
@@ -0,0 +1,109 @@
+import os
+import tempfile
+import pytest
+import migrations
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import OperationalError
+from migrations import LATEST_VERSION, add_todo_versions, assign_legacy_todos, current_version, ensure_schema, migrate_todo_owners
+
+def test_migrate_todo_owners_on_a_pre_ownership_database():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'old.db')}")
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR, hashed_password VARCHAR)"))
+            connection.execute(text("CREATE TABLE todos (id INTEGER PRIMARY KEY, title VARCHAR, description VARCHAR)"))
+            connection.execute(text("INSERT INTO todos (id, title) VALUES (1, 'Old todo')"))
+
+        migrate_todo_owners(engine)
+        # Running it again is a no-op
+        migrate_todo_owners(engine)
+        assign_legacy_todos(engine, legacy_owner_id="7")
+
+        assert "owner_id" in {column["name"] for column in inspect(engine).get_columns("todos")}
+        assert "ix_todos_owner_id_id" in {index["name"] for index in inspect(engine).get_indexes("todos")}
+        with engine.connect() as connection:
+            assert connection.execute(text("SELECT owner_id FROM todos WHERE id = 1")).scalar() == 7
+        engine.dispose()
+
+def test_add_todo_versions_on_an_existing_database():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'old.db')}")
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR, hashed_password VARCHAR)"))
+            connection.execute(text("CREATE TABLE todos (id INTEGER PRIMARY KEY, title VARCHAR, description VARCHAR, owner_id INTEGER)"))
+            connection.execute(text("INSERT INTO todos (id, title, owner_id) VALUES (3, 'a', 1), (8, 'b', 1)"))
+
+        add_todo_versions(engine)
+        add_todo_versions(engine)
+
+        assert "ix_todos_owner_id_version" in {index["name"] for index in inspect(engine).get_indexes("todos")}
+        with engine.connect() as connection:
+            assert connection.execute(text("SELECT version FROM todos ORDER BY id")).scalars().all() == [3, 8]
+            # New versions continue after the backfilled ones
+            assert connection.execute(text("SELECT value FROM todo_version")).scalars().all() == [8]
+        engine.dispose()
+
+def test_ensure_schema_migrates_once_then_only_reads_the_version():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'new.db')}")
+        assert ensure_schema(engine) == 0
+        assert current_version(engine) == LATEST_VERSION
+        assert {"todos", "users", "todos_fts"} <= set(inspect(engine).get_table_names())
+
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        assert ensure_schema(engine) == LATEST_VERSION
+        assert len(statements) == 1
+        engine.dispose()
+
+def test_ensure_schema_without_auto_migrate_refuses_an_old_schema():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'old.db')}")
+        with pytest.raises(RuntimeError):
+            ensure_schema(engine, auto_migrate=False)
+        assert inspect(engine).get_table_names() == []
+        engine.dispose()
+
+def test_an_unreachable_database_is_not_version_0():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'missing', 'app.db')}")
+        with pytest.raises(OperationalError):
+            current_version(engine)
+        with pytest.raises(OperationalError):
+            ensure_schema(engine, auto_migrate=False)
+        engine.dispose()
+
+def test_migrate_when_another_worker_adds_the_column_first(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'old.db')}")
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR, hashed_password VARCHAR)"))
+            connection.execute(text("CREATE TABLE todos (id INTEGER PRIMARY KEY, title VARCHAR, description VARCHAR)"))
+
+        # This worker checks the columns, then the other worker's ALTER lands before its own
+        table_columns = migrations.table_columns
+        def stale_columns(engine, table):
+            columns = table_columns(engine, table)
+            if "owner_id" not in columns:
+                with engine.begin() as connection:
+                    connection.execute(text("ALTER TABLE todos ADD COLUMN owner_id INTEGER"))
+            return columns
+        monkeypatch.setattr(migrations, "table_columns", stale_columns)
+
+        assert migrations.migrate(engine) == 0
+        assert current_version(engine) == LATEST_VERSION
+        engine.dispose()
+
+def test_legacy_owner_is_assigned_on_an_up_to_date_database(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'app.db')}")
+        migrations.migrate(engine)
+        with engine.begin() as connection:
+            connection.execute(text("INSERT INTO todos (id, title) VALUES (1, 'Ownerless')"))
+
+        # Set only after the schema reached the latest version
+        monkeypatch.setattr(migrations, "LEGACY_TODO_OWNER_ID", "3")
+        assert migrations.migrate(engine) == LATEST_VERSION
+        with engine.connect() as connection:
+            assert connection.execute(text("SELECT owner_id FROM todos WHERE id = 1")).scalar() == 3
+        engine.dispose()
@@ -0,0 +1,40 @@
+import os
+import tempfile
+import threading
+import pytest
+from sqlalchemy import create_engine, make_url, text
+from sqlalchemy.exc import TimeoutError
+from pool_metrics import PoolMetrics, InstrumentedQueuePool, instrumented_pool_class, instrument
+
+def test_pool_class_matches_the_dialect():
+    assert instrumented_pool_class(make_url("sqlite:////tmp/todos.db")) is InstrumentedQueuePool
+    assert instrumented_pool_class(make_url("sqlite://")) is None
+
+def test_checkouts_waits_and_timeouts():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'pool.db')}", poolclass=InstrumentedQueuePool,
+                               pool_size=1, max_overflow=0, pool_timeout=0.2)
+        metrics = PoolMetrics()
+        instrument(engine, metrics)
+
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            # The only connection is busy: the next checkout waits, then times out
+            with pytest.raises(TimeoutError):
+                engine.connect()
+
+            released = threading.Timer(0.05, connection.close)
+            released.start()
+            # This one waits for the timer to hand the connection back
+            with engine.connect() as waiting:
+                waiting.execute(text("SELECT 1"))
+            released.join()
+
+        snapshot = metrics.snapshot()
+        assert snapshot["checkouts"] == 2
+        assert snapshot["connects"] == 1
+        assert snapshot["waits"] == 2
+        assert snapshot["timeouts"] == 1
+        assert snapshot["wait_seconds_max"] >= 0.2
+        assert snapshot["size"] == 1
+        engine.dispose()
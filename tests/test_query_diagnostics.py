@@ -0,0 +1,63 @@
+import logging
+from sqlalchemy import create_engine, text
+from query_diagnostics import QueryDiagnosticsState, RequestQueries, current_queries, statement_shape
+
+def test_statement_shape_folds_in_lists():
+    assert statement_shape("SELECT id FROM todos WHERE id IN (?, ?)") == statement_shape(
+        "SELECT id FROM todos\n WHERE id IN (?, ?, ?)")
+    assert statement_shape("SELECT id FROM todos WHERE id = ?") == "SELECT id FROM todos WHERE id = ?"
+
+def test_slow_query_logged_with_route_and_plan(caplog):
+    diagnostics = QueryDiagnosticsState(slow_threshold=0.0, explain=True)
+    engine = create_engine("sqlite://")
+    diagnostics.enable()
+    queries = RequestQueries({"type": "http", "method": "GET", "path": "/todos"})
+    token = current_queries.set(queries)
+    try:
+        with caplog.at_level(logging.WARNING, logger="todo_app.queries"):
+            with engine.connect() as connection:
+                connection.execute(text("SELECT :value"), {"value": 42})
+    finally:
+        current_queries.reset(token)
+        diagnostics.disable()
+
+    assert diagnostics.slow_queries == 1
+    assert "slow query" in caplog.text
+    assert "GET /todos" in caplog.text
+    assert "42" in caplog.text
+    assert "plan:" in caplog.text
+
+def test_repeated_statement_flagged(caplog):
+    diagnostics = QueryDiagnosticsState(slow_threshold=10.0, repeat_threshold=3)
+    engine = create_engine("sqlite://")
+    diagnostics.enable()
+    queries = RequestQueries({"type": "http", "method": "GET", "path": "/todos"})
+    token = current_queries.set(queries)
+    try:
+        with engine.connect() as connection:
+            for value in range(5):
+                connection.execute(text("SELECT :value"), {"value": value})
+    finally:
+        current_queries.reset(token)
+        diagnostics.disable()
+
+    with caplog.at_level(logging.WARNING, logger="todo_app.queries"):
+        diagnostics.finish_request(queries)
+    assert diagnostics.n_plus_one_requests == 1
+    assert "ran 5 times" in caplog.text
+    assert diagnostics.slow_queries == 0
+
+def test_failed_statement_does_not_leave_its_start_time_behind():
+    diagnostics = QueryDiagnosticsState(slow_threshold=10.0)
+    engine = create_engine("sqlite://")
+    diagnostics.enable()
+    try:
+        with engine.connect() as connection:
+            for _ in range(3):
+                try:
+                    connection.execute(text("SELECT * FROM missing_table"))
+                except Exception:
+                    pass
+            assert connection.info.get("diagnostics_start") == []
+    finally:
+        diagnostics.disable()
@@ -0,0 +1,79 @@
+import threading
+from typing import Annotated
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+import database
+from database import get_db
+from replicas import ReplicaRouter
+
+def make_app():
+    app = FastAPI()
+    db_dependency = Annotated[Session, Depends(get_db)]
+
+    @app.get("/source")
+    def source(db: db_dependency):
+        return {"database": db.get_bind().url.database}
+
+    @app.post("/source")
+    def write(db: db_dependency):
+        return {"database": db.get_bind().url.database}
+
+    return app
+
+def test_get_reads_from_replica_and_writes_stay_on_primary(tmp_path, monkeypatch):
+    replica_path = str(tmp_path / "replica.db")
+    router = ReplicaRouter([create_engine(f"sqlite:///{replica_path}")])
+    router.check_all()
+    monkeypatch.setattr(database, "read_replicas", router)
+    client = TestClient(make_app())
+
+    assert client.get("/source").json()["database"] == replica_path
+    assert client.post("/source").json()["database"] == database.engine.url.database
+    # Read-your-writes: the writer's next reads go to the primary
+    assert client.get("/source").json()["database"] == database.engine.url.database
+    assert TestClient(make_app()).get("/source").json()["database"] == replica_path
+
+def test_round_robin_skips_unhealthy_replicas(tmp_path):
+    first = create_engine(f"sqlite:///{tmp_path / 'first.db'}")
+    second = create_engine(f"sqlite:///{tmp_path / 'second.db'}")
+    broken = create_engine(f"sqlite:///{tmp_path / 'missing' / 'broken.db'}")
+    router = ReplicaRouter([first, broken, second], check_interval=60)
+    router.check_all()
+
+    picked = [router.pick() for _ in range(4)]
+    assert picked == [first, second, first, second]
+    assert router.metrics()["healthy"] == 2
+
+def test_falls_back_to_primary_without_healthy_replicas(tmp_path):
+    router = ReplicaRouter([create_engine(f"sqlite:///{tmp_path / 'missing' / 'broken.db'}")], check_interval=0)
+    router.check_all()
+    assert router.pick() is None
+    assert router.metrics()["primary_fallbacks"] == 1
+
+    # Comes back once a check passes again
+    router.replicas[0].checking.join(5)
+    router.replicas[0].engine = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    router.pick()
+    router.replicas[0].checking.join(5)
+    assert router.pick() is router.replicas[0].engine
+
+def test_pick_never_waits_on_a_health_check(tmp_path):
+    router = ReplicaRouter([create_engine(f"sqlite:///{tmp_path / 'replica.db'}")], check_interval=0)
+    checked = threading.Event()
+    release = threading.Event()
+
+    def slow_check(replica):
+        checked.set()
+        release.wait(5)
+        replica.healthy = True
+
+    router.check = slow_check
+    # Unchecked replicas take no reads; the check runs off the request path
+    assert router.pick() is None
+    assert checked.wait(5)
+    assert router.pick() is None
+    release.set()
+    router.replicas[0].checking.join(5)
+    assert router.pick() is router.replicas[0].engine
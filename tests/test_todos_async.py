@@ -0,0 +1,74 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy import create_engine
+from database import Base
+from Jwt.auth import create_access_token
+from datetime import timedelta
+from dotenv import load_dotenv
+import os
+
+# Load environment variables from .env
+load_dotenv()
+
+# Use a test database, reachable through both a sync and an async driver
+TEST_DATABASE_URL = os.environ.get("TestDatabaseConnectionString")
+TEST_ASYNC_DATABASE_URL = os.environ.get("TestAsyncDatabaseConnectionString")
+if not TEST_ASYNC_DATABASE_URL:
+    pytest.skip("TestAsyncDatabaseConnectionString is not set", allow_module_level=True)
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from todos_async import router, get_async_db
+
+engine = create_engine(TEST_DATABASE_URL)
+Base.metadata.create_all(bind=engine)
+async_engine = create_async_engine(TEST_ASYNC_DATABASE_URL)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Override dependency to use the test database
+async def get_test_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+app = FastAPI()
+app.include_router(router)
+app.dependency_overrides[get_async_db] = get_test_async_db
+
+client = TestClient(app, headers={"Authorization": f"Bearer {create_access_token('testuser', 1, timedelta(minutes=20))}"})
+
+def test_async_todo_crud():
+    todo_data = {"id": 9001, "title": "Async Todo", "description": "Async Description"}
+
+    response_create = client.post("/todos", json=todo_data)
+    assert response_create.status_code == 200
+    assert response_create.json()["title"] == todo_data["title"]
+
+    response_read = client.get("/todos", params={"limit": 1000})
+    assert response_read.status_code == 200
+    assert 9001 in [todo["id"] for todo in response_read.json()]
+
+    response_update = client.put("/todos/9001", json={"todo_id": 9001, "title": "Updated Async Todo"})
+    assert response_update.status_code == 200
+    assert response_update.json()["title"] == "Updated Async Todo"
+
+    response_delete = client.delete("/todos/9001")
+    assert response_delete.status_code == 200
+    assert response_delete.json()["message"] == "Todo deleted"
+
+def test_async_missing_todo():
+    response = client.delete("/todos/424242")
+    assert response.status_code == 404
+
+def test_async_create_of_an_existing_id_is_409():
+    assert client.post("/todos", json={"id": 9002, "title": "First"}).status_code == 200
+    response = client.post("/todos", json={"id": 9002, "title": "Again"})
+    assert response.status_code == 409
+    client.delete("/todos/9002")
+
+def test_async_listing_matches_the_sync_response_model():
+    client.post("/todos", json={"id": 9003, "title": "Paged", "description": "async"})
+    page = client.get("/todos", params={"cursor": "", "limit": 1000}).json()
+    assert {"id": 9003, "title": "Paged", "description": "async"} in page["todos"]
+    schema = client.get("/openapi.json").json()["paths"]["/todos"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    assert "TodoPage" in str(schema) and "TodoOut" in str(schema)
+    client.delete("/todos/9003")
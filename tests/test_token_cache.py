@@ -0,0 +1,43 @@
+import asyncio
+import time
+from datetime import timedelta
+import pytest
+from fastapi import HTTPException
+from Jwt.auth import create_access_token, get_current_user
+from Jwt.token_cache import TokenCache, token_cache
+
+def test_lru_eviction():
+    cache = TokenCache(max_size=2, ttl=60)
+    expires = time.time() + 60
+    cache.put("a", {"username": "a", "id": 1}, expires)
+    cache.put("b", {"username": "b", "id": 2}, expires)
+    assert cache.get("a") == {"username": "a", "id": 1}
+    cache.put("c", {"username": "c", "id": 3}, expires)
+
+    # "b" was the least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.metrics()["evictions"] == 1
+    assert cache.metrics()["hits"] == 2
+
+def test_entry_never_outlives_exp():
+    cache = TokenCache(max_size=10, ttl=60)
+    cache.put("expired", {"username": "a", "id": 1}, time.time() - 1)
+    cache.put("no-exp", {"username": "a", "id": 1}, None)
+    assert cache.get("expired") is None
+    assert cache.get("no-exp") is None
+    assert cache.metrics()["size"] == 0
+
+def test_get_current_user_caches_valid_tokens_only():
+    token_cache.clear()
+    access_token = create_access_token("testuser", 1, timedelta(minutes=20))
+    hits = token_cache.hits
+
+    assert asyncio.run(get_current_user(access_token)) == {"username": "testuser", "id": 1}
+    assert asyncio.run(get_current_user(access_token)) == {"username": "testuser", "id": 1}
+    assert token_cache.hits == hits + 1
+
+    size = token_cache.metrics()["size"]
+    with pytest.raises(HTTPException):
+        asyncio.run(get_current_user(access_token + "tampered"))
+    assert token_cache.metrics()["size"] == size
@@ -0,0 +1,100 @@
+import pandas as pd
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+
+# Data layer for the Streamlit client. Every browser session gets one
+# keep-alive requests.Session (kept in st.session_state, so it survives
+# reruns) that carries the bearer token from login. Todos are read one page
+# at a time from the server, each page at most once per rerun, and dropped
+# after every write.
+
+BASE_URL = "http://127.0.0.1:8000"
+PAGE_SIZE = 20
+
+def http():
+    if "http" not in st.session_state:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        st.session_state.http = session
+    return st.session_state.http
+
+def request(method: str, path: str, **kwargs):
+    response = http().request(method, f"{BASE_URL}{path}", **kwargs)
+    if response.status_code == 401 and st.session_state.get("logged_in"):
+        # The token expired: back to the login form on the next rerun
+        logout()
+    return response
+
+def login(username: str, password: str):
+    response = request("POST", "/auth/token", data={"username": username, "password": password})
+    if response.status_code != 200:
+        return False
+    st.session_state.token = response.json()["access_token"]
+    http().headers["Authorization"] = f"Bearer {st.session_state.token}"
+    st.session_state.logged_in = True
+    return True
+
+def logout():
+    st.session_state.logged_in = False
+    st.session_state.pop("token", None)
+    http().headers.pop("Authorization", None)
+    invalidate()
+
+def signup(username: str, password: str):
+    return request("POST", "/auth/create/user", json={"username": username, "password": password})
+
+def start_rerun():
+    # Called at the top of every rerun so each one sees fresh data once
+    invalidate()
+
+def invalidate():
+    st.session_state.pop("pages", None)
+
+def fetch(path: str, params: dict):
+    # GETs are cached for the rest of the rerun, so tabs showing the same
+    # page share one request
+    pages = st.session_state.setdefault("pages", {})
+    key = (path, tuple(sorted(params.items())))
+    if key not in pages:
+        response = request("GET", path, params=params)
+        pages[key] = response.json() if response.status_code == 200 else None
+    return pages[key]
+
+def page(q: str, token=None, limit: int = PAGE_SIZE):
+    # One page of todos and the token of the next one (None on the last page).
+    # Listings page by keyset cursor; search results are ranked, so by offset.
+    if q:
+        skip = token or 0
+        rows = fetch("/todos/search", {"q": q, "skip": skip, "limit": limit + 1}) or []
+        return rows[:limit], (skip + limit if len(rows) > limit else None)
+    body = fetch("/todos", {"cursor": token or "", "limit": limit})
+    if body is None:
+        return [], None
+    return body["todos"], body["next_cursor"]
+
+def to_frame(rows):
+    return pd.DataFrame(rows, columns=["id", "title", "description"])
+
+def get_todo(todo_id):
+    return fetch(f"/todos/{todo_id}", {})
+
+def todo_exists(todo_id):
+    return request("GET", f"/todos/{todo_id}").status_code == 200
+
+def create_todo(todo_id, title: str, description: str):
+    response = request("POST", "/todos", json={"id": todo_id, "title": title, "description": description})
+    invalidate()
+    return response
+
+def update_todo(todo_id, title: str, description: str):
+    response = request("PUT", f"/todos/{todo_id}", json={"todo_id": todo_id, "title": title, "description": description})
+    invalidate()
+    return response
+
+def delete_todo(todo_id):
+    response = request("DELETE", f"/todos/{todo_id}")
+    invalidate()
+    return response
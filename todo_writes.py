@@ -0,0 +1,36 @@
+from sqlalchemy import delete, insert, update
+from database import Todo
+
+# Single-round-trip statements for the /todos write handlers (main.py and
+# todos_async.py). Owner scoping lives in the WHERE clause, so an update or
+# delete that matches no row is a 404 without a SELECT first. On dialects with
+# RETURNING (PostgreSQL, SQLite >= 3.35) the written row comes back from the
+# same statement; elsewhere the handler falls back to rowcount and the values
+# it sent, which are all the row holds.
+todos = Todo.__table__
+COLUMNS = (todos.c.id, todos.c.title, todos.c.description)
+
+def insert_todo(dialect, row: dict):
+    statement = insert(todos).values(**row)
+    return statement.returning(*COLUMNS) if dialect.insert_returning else statement
+
+def update_todo(dialect, owner_id: int, todo_id: int, values: dict):
+    statement = update(todos).where(todos.c.owner_id == owner_id, todos.c.id == todo_id).values(**values)
+    return statement.returning(*COLUMNS) if dialect.update_returning else statement
+
+def delete_todo(dialect, owner_id: int, todo_id: int):
+    statement = delete(todos).where(todos.c.owner_id == owner_id, todos.c.id == todo_id)
+    return statement.returning(todos.c.id) if dialect.delete_returning else statement
+
+def todo_fields(values: dict):
+    # The shape every handler returns and publishes to the change feed
+    return {column.name: values.get(column.name) for column in COLUMNS}
+
+def written_row(result, returning: bool, values: dict):
+    # The row as stored, or None when the statement matched nothing
+    if returning:
+        row = result.first()
+        return None if row is None else dict(row._mapping)
+    if result.rowcount == 0:
+        return None
+    return todo_fields(values)
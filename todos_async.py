@@ -0,0 +1,103 @@
+from typing import Annotated, List, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal, Todo
+from schemas import TodoCreate, TodoUpdate, TodoOut, TodoPage
+from pagination import MAX_PAGE_SIZE, decode_cursor, keyset_page
+from listing_cache import listing_cache, todo_to_dict
+from change_feed import change_hub
+from changes import stamp, record_deletes
+import todo_writes
+from todo_writes import written_row
+from etags import make_etag, etag_matches, not_modified
+from Jwt.auth import get_current_user
+
+# Async versions of the /todos handlers in main.py. They are only mounted when
+# AsyncDatabaseConnectionString is set, so they run on the event loop instead
+# of Starlette's thread pool.
+router = APIRouter()
+
+# Dependency
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+async_db_dependency = Annotated[AsyncSession, Depends(get_async_db)]
+user_dependency = Annotated[dict, Depends(get_current_user)]
+
+@router.post("/todos")
+async def create_todo(todo: TodoCreate, user: user_dependency, db: async_db_dependency):
+    dialect = db.get_bind().dialect
+    values = dict(todo.dict(), owner_id=user["id"])
+    await db.run_sync(stamp, [values])
+    try:
+        row = written_row(await db.execute(todo_writes.insert_todo(dialect, values)), dialect.insert_returning, values)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Todo already exists")
+    await db.commit()
+    listing_cache.invalidate(user["id"], [row["id"]], shifts=True)
+    change_hub.publish(user["id"], "created", row)
+    return row
+
+@router.get("/todos", response_model=Union[TodoPage, List[TodoOut]])
+async def read_todos(request: Request, response: Response, user: user_dependency, db: async_db_dependency,
+                     skip: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE), cursor: str = None):
+    owner_id = user["id"]
+    if cursor is not None:
+        after_id = decode_cursor(cursor)
+        cached = listing_cache.get_keyset(owner_id, after_id, limit)
+        if cached is None:
+            generation = listing_cache.generation(owner_id)
+            # Columns only: rows become dicts without building ORM objects
+            statement = select(Todo.id, Todo.title, Todo.description).where(Todo.owner_id == owner_id)
+            if after_id is not None:
+                statement = statement.where(Todo.id > after_id)
+            result = await db.execute(statement.order_by(Todo.id).limit(limit + 1))
+            body = keyset_page([todo_to_dict(todo) for todo in result], limit)
+            etag = make_etag(body)
+            listing_cache.set_keyset(owner_id, after_id, limit, body, etag, generation)
+        else:
+            body, etag = cached
+    else:
+        cached = listing_cache.get_offset(owner_id, skip, limit)
+        if cached is None:
+            generation = listing_cache.generation(owner_id)
+            result = await db.execute(select(Todo.id, Todo.title, Todo.description).where(Todo.owner_id == owner_id)
+                                      .order_by(Todo.id).offset(skip).limit(limit))
+            body = [todo_to_dict(todo) for todo in result]
+            etag = make_etag(body)
+            listing_cache.set_offset(owner_id, skip, limit, body, etag, generation)
+        else:
+            body, etag = cached
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    return body
+
+@router.put("/todos/{todo_id}")
+async def update_todo(todo_id: int, updated_todo: TodoUpdate, user: user_dependency, db: async_db_dependency):
+    dialect = db.get_bind().dialect
+    values = updated_todo.dict(exclude={"todo_id"})
+    await db.run_sync(stamp, [values])
+    result = await db.execute(todo_writes.update_todo(dialect, user["id"], todo_id, values))
+    row = written_row(result, dialect.update_returning, dict(values, id=todo_id))
+    if row is None:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    await db.commit()
+    listing_cache.invalidate(user["id"], [todo_id], shifts=False)
+    change_hub.publish(user["id"], "updated", row)
+    return row
+
+@router.delete("/todos/{todo_id}")
+async def delete_todo(todo_id: int, user: user_dependency, db: async_db_dependency):
+    dialect = db.get_bind().dialect
+    result = await db.execute(todo_writes.delete_todo(dialect, user["id"], todo_id))
+    if written_row(result, dialect.delete_returning, {"id": todo_id}) is None:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    await db.run_sync(record_deletes, user["id"], [todo_id])
+    await db.commit()
+    listing_cache.invalidate(user["id"], [todo_id], shifts=True)
+    change_hub.publish(user["id"], "deleted", {"id": todo_id})
+    return {"message": "Todo deleted"}
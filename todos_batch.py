@@ -0,0 +1,120 @@
+from typing import Annotated, List
+from fastapi import APIRouter, Depends
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette import status
+from database import Todo, get_db
+from Jwt.auth import get_current_user
+from schemas import TodoCreate, TodoUpdate
+from listing_cache import listing_cache
+from changes import stamp, record_deletes
+from change_feed import change_hub
+from todo_writes import todo_fields
+
+# Batch versions of the /todos writes. Each batch runs as bulk statements in a
+# single transaction and reports a result for every item, in request order.
+router = APIRouter(
+    prefix="/todos/batch",
+    tags=["batch"]
+    )
+
+db_dependency = Annotated[Session, Depends(get_db)]
+user_dependency = Annotated[dict, Depends(get_current_user)]
+
+# Keeps IN (...) lists under every dialect's bound-parameter limit
+CHUNK_SIZE = 500
+
+def existing_ids(db: Session, ids, owner_id: int = None):
+    # Ids are global, so creates check every owner; updates and deletes only
+    # see the caller's todos
+    ids = list(ids)
+    found = set()
+    for start in range(0, len(ids), CHUNK_SIZE):
+        statement = select(Todo.id).where(Todo.id.in_(ids[start:start + CHUNK_SIZE]))
+        if owner_id is not None:
+            statement = statement.where(Todo.owner_id == owner_id)
+        found.update(db.scalars(statement))
+    return found
+
+def result(todo_id: int, status_code: int, detail: str = None):
+    return {"id": todo_id, "status": status_code, "detail": detail}
+
+@router.post("")
+def create_todos(todos: List[TodoCreate], user: user_dependency, db: db_dependency):
+    existing = existing_ids(db, {todo.id for todo in todos})
+    results = []
+    rows = []
+    for todo in todos:
+        if todo.id in existing:
+            results.append(result(todo.id, status.HTTP_409_CONFLICT, "Todo already exists"))
+        else:
+            existing.add(todo.id)
+            rows.append(dict(todo.dict(), owner_id=user["id"]))
+            results.append(result(todo.id, status.HTTP_201_CREATED))
+    if rows:
+        stamp(db, rows)
+        try:
+            with db.begin_nested():
+                db.execute(insert(Todo), rows)
+        except IntegrityError:
+            # Someone inserted one of these ids after our check: insert row by
+            # row so only the conflicting items fail
+            conflicts = set()
+            for row in rows:
+                try:
+                    with db.begin_nested():
+                        db.execute(insert(Todo), [row])
+                except IntegrityError:
+                    conflicts.add(row["id"])
+            for item in results:
+                if item["id"] in conflicts and item["status"] == status.HTTP_201_CREATED:
+                    item.update(result(item["id"], status.HTTP_409_CONFLICT, "Todo already exists"))
+    db.commit()
+    created = [item["id"] for item in results if item["status"] == status.HTTP_201_CREATED]
+    listing_cache.invalidate(user["id"], created, shifts=True)
+    created = set(created)
+    for row in rows:
+        if row["id"] in created:
+            change_hub.publish(user["id"], "created", todo_fields(row))
+    return {"results": results}
+
+@router.put("")
+def update_todos(todos: List[TodoUpdate], user: user_dependency, db: db_dependency):
+    existing = existing_ids(db, {todo.todo_id for todo in todos}, user["id"])
+    results = []
+    # The last update for an id wins, as if the requests had been sent one by one
+    rows = {}
+    for todo in todos:
+        if todo.todo_id in existing:
+            rows[todo.todo_id] = {"id": todo.todo_id, "title": todo.title, "description": todo.description}
+            results.append(result(todo.todo_id, status.HTTP_200_OK))
+        else:
+            results.append(result(todo.todo_id, status.HTTP_404_NOT_FOUND, "Todo not found"))
+    if rows:
+        db.execute(update(Todo), stamp(db, list(rows.values())))
+    db.commit()
+    listing_cache.invalidate(user["id"], rows.keys(), shifts=False)
+    for row in rows.values():
+        change_hub.publish(user["id"], "updated", todo_fields(row))
+    return {"results": results}
+
+@router.post("/delete")
+def delete_todos(todo_ids: List[int], user: user_dependency, db: db_dependency):
+    existing = existing_ids(db, set(todo_ids), user["id"])
+    results = []
+    for todo_id in todo_ids:
+        if todo_id in existing:
+            existing.discard(todo_id)
+            results.append(result(todo_id, status.HTTP_200_OK, "Todo deleted"))
+        else:
+            results.append(result(todo_id, status.HTTP_404_NOT_FOUND, "Todo not found"))
+    deleted = [item["id"] for item in results if item["status"] == status.HTTP_200_OK]
+    for start in range(0, len(deleted), CHUNK_SIZE):
+        db.execute(delete(Todo).where(Todo.owner_id == user["id"], Todo.id.in_(deleted[start:start + CHUNK_SIZE])))
+    record_deletes(db, user["id"], deleted)
+    db.commit()
+    listing_cache.invalidate(user["id"], deleted, shifts=True)
+    for todo_id in deleted:
+        change_hub.publish(user["id"], "deleted", {"id": todo_id})
+    return {"results": results}
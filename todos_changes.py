@@ -0,0 +1,25 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from database import get_db
+from Jwt.auth import get_current_user
+from schemas import TodoChanges
+from changes import changes_since
+
+# Delta sync: instead of refetching every todo, a client keeps the version
+# from its last sync and asks for what changed after it. Start with since=0;
+# while has_more is true, call again with the returned version.
+router = APIRouter(
+    prefix="/todos/changes",
+    tags=["sync"]
+    )
+
+db_dependency = Annotated[Session, Depends(get_db)]
+user_dependency = Annotated[dict, Depends(get_current_user)]
+
+MAX_CHANGES = 1000
+
+@router.get("", response_model=TodoChanges)
+def todo_changes(user: user_dependency, db: db_dependency, since: int = Query(0, ge=0),
+                 limit: int = Query(MAX_CHANGES, ge=1, le=MAX_CHANGES)):
+    return changes_since(db, user["id"], since, limit)
@@ -0,0 +1,61 @@
+import csv
+import io
+import json
+from typing import Annotated, Literal
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from database import Todo, get_db
+from Jwt.auth import get_current_user
+
+# Streams every todo the caller owns as NDJSON or CSV. Rows come from a
+# server-side cursor in chunks of EXPORT_CHUNK_SIZE and each chunk is written
+# as soon as it is read, so memory stays flat and the first byte goes out
+# after the first chunk.
+router = APIRouter(
+    prefix="/todos/export",
+    tags=["export"]
+    )
+
+db_dependency = Annotated[Session, Depends(get_db)]
+user_dependency = Annotated[dict, Depends(get_current_user)]
+
+EXPORT_CHUNK_SIZE = 1000
+COLUMNS = ["id", "title", "description"]
+
+def iter_rows(bind, owner_id: int, chunk_size: int = EXPORT_CHUNK_SIZE):
+    # Uses its own connection so the stream does not depend on when the
+    # request's session is closed
+    with bind.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=chunk_size).execute(
+            select(Todo.id, Todo.title, Todo.description).where(Todo.owner_id == owner_id).order_by(Todo.id)
+        )
+        for rows in result.partitions():
+            yield rows
+
+def ndjson_chunks(bind, owner_id: int):
+    for rows in iter_rows(bind, owner_id):
+        yield "".join(json.dumps(dict(zip(COLUMNS, row))) + "\n" for row in rows)
+
+def csv_chunks(bind, owner_id: int):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for rows in iter_rows(bind, owner_id):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when the table is empty
+    if buffer.getvalue():
+        yield buffer.getvalue()
+
+@router.get("")
+def export_todos(user: user_dependency, db: db_dependency, format: Literal["ndjson", "csv"] = "ndjson"):
+    bind = db.get_bind()
+    if format == "csv":
+        return StreamingResponse(csv_chunks(bind, user["id"]), media_type="text/csv",
+                                 headers={"Content-Disposition": "attachment; filename=todos.csv"})
+    return StreamingResponse(ndjson_chunks(bind, user["id"]), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": "attachment; filename=todos.ndjson"})
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import anyio
+from typing import Annotated
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette import status
+from change_feed import change_hub
+from Jwt.auth import get_current_user, validate_token
+
+# Live change feed for the caller's todos, so clients can stop polling
+# GET /todos. Every event is {"action": "created" | "updated" | "deleted",
+# "todo": {...}}; deletes only carry the id. A stream that ends with a
+# "dropped" event fell too far behind: refetch, then subscribe again.
+router = APIRouter(
+    prefix="/todos",
+    tags=["feed"]
+    )
+
+user_dependency = Annotated[dict, Depends(get_current_user)]
+
+# Seconds between SSE comments on an idle stream, so proxies keep it open
+KEEPALIVE_INTERVAL = 15
+
+def public(event: dict):
+    return {"action": event["action"], "todo": event["todo"]}
+
+async def sse_events(subscriber):
+    try:
+        while True:
+            try:
+                event = await subscriber.get(KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                yield "event: dropped\ndata: {}\n\n"
+                return
+            yield f"event: {event['action']}\ndata: {json.dumps(public(event))}\n\n"
+    finally:
+        change_hub.unsubscribe(subscriber)
+
+@router.get("/events")
+async def todo_events(user: user_dependency):
+    # Subscribed before the response starts, so no write after this is missed
+    subscriber = change_hub.subscribe(user["id"])
+    return StreamingResponse(sse_events(subscriber), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def websocket_user(websocket: WebSocket):
+    # Browsers cannot set headers on a WebSocket, so the token may also come
+    # as ?token=
+    token = websocket.query_params.get("token")
+    authorization = websocket.headers.get("authorization", "")
+    if token is None and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        return None
+    try:
+        return await validate_token(token)
+    except HTTPException:
+        return None
+
+@router.websocket("/ws")
+async def todo_websocket(websocket: WebSocket):
+    user = await websocket_user(websocket)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    subscriber = change_hub.subscribe(user["id"])
+
+    async def forward():
+        while True:
+            event = await subscriber.get()
+            if event is None:
+                await websocket.send_json({"action": "dropped"})
+                await websocket.close()
+                break
+            await websocket.send_json(public(event))
+        tasks.cancel_scope.cancel()
+
+    async def until_disconnect():
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            tasks.cancel_scope.cancel()
+
+    try:
+        async with anyio.create_task_group() as tasks:
+            tasks.start_soon(forward)
+            tasks.start_soon(until_disconnect)
+    finally:
+        change_hub.unsubscribe(subscriber)
@@ -0,0 +1,149 @@
+import csv
+import io
+import json
+import time
+from typing import Annotated, Literal
+from fastapi import APIRouter, Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from database import Todo, get_db
+from Jwt.auth import get_current_user
+from schemas import TodoCreate
+from todos_batch import existing_ids
+from listing_cache import listing_cache
+from changes import stamp
+from change_feed import change_hub
+from todo_writes import todo_fields
+
+# Bulk import from a streamed NDJSON or CSV request body. The body is parsed
+# as it arrives and inserted in chunks of chunk_size rows, one transaction per
+# chunk, so memory is bounded by the chunk size rather than the upload size.
+router = APIRouter(
+    prefix="/todos/import",
+    tags=["import"]
+    )
+
+db_dependency = Annotated[Session, Depends(get_db)]
+user_dependency = Annotated[dict, Depends(get_current_user)]
+
+IMPORT_CHUNK_SIZE = 1000
+# Caps the ids / errors listed in the report; the counts are always exact
+MAX_REPORTED = 1000
+
+async def iter_lines(request: Request):
+    buffer = b""
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8").rstrip("\r")
+
+async def iter_ndjson(request: Request):
+    async for line in iter_lines(request):
+        if line.strip():
+            yield json.loads(line)
+
+async def iter_csv(request: Request):
+    header = None
+    record = []
+    async for line in iter_lines(request):
+        # A quoted field may span lines: a record ends on a line that leaves
+        # the quote count even
+        record.append(line)
+        text = "\n".join(record)
+        if text.count('"') % 2:
+            continue
+        record = []
+        if not text.strip():
+            continue
+        values = next(csv.reader(io.StringIO(text)))
+        if header is None:
+            header = values
+            continue
+        row = dict(zip(header, values))
+        # Export writes NULL descriptions as empty fields
+        if row.get("description") == "":
+            del row["description"]
+        yield row
+
+def insert_chunk(bind, rows):
+    # Returns the ids that were skipped because they already exist
+    with bind.begin() as connection:
+        stamp(connection, rows)
+        if bind.dialect.name in ("postgresql", "sqlite"):
+            if bind.dialect.name == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            # One multi-row INSERT ... ON CONFLICT DO NOTHING RETURNING id per chunk
+            statement = dialect_insert(Todo).on_conflict_do_nothing(index_elements=[Todo.id]).returning(Todo.id)
+            inserted = set(connection.scalars(statement, rows))
+        else:
+            existing = existing_ids(connection, [row["id"] for row in rows])
+            rows = [row for row in rows if row["id"] not in existing]
+            if rows:
+                connection.execute(insert(Todo), rows)
+            inserted = {row["id"] for row in rows}
+    return [row["id"] for row in rows if row["id"] not in inserted]
+
+@router.post("")
+async def import_todos(request: Request, user: user_dependency, db: db_dependency,
+                       format: Literal["ndjson", "csv"] = None,
+                       chunk_size: int = IMPORT_CHUNK_SIZE):
+    if format is None:
+        format = "csv" if request.headers.get("content-type", "").startswith("text/csv") else "ndjson"
+    records = iter_csv(request) if format == "csv" else iter_ndjson(request)
+    bind = db.get_bind()
+    chunk_size = max(chunk_size, 1)
+
+    report = {"inserted": 0, "duplicates": 0, "invalid": 0, "duplicate_ids": [], "errors": []}
+    start = time.perf_counter()
+    chunk = {}
+    row_number = 0
+
+    async def flush():
+        duplicates = await run_in_threadpool(insert_chunk, bind, list(chunk.values()))
+        skipped = set(duplicates)
+        listing_cache.invalidate(user["id"], chunk.keys() - skipped, shifts=True)
+        # Committed by now; a big import may drop slow subscribers, who refetch
+        for todo_id, row in chunk.items():
+            if todo_id not in skipped:
+                change_hub.publish(user["id"], "created", todo_fields(row))
+        report["inserted"] += len(chunk) - len(duplicates)
+        report["duplicates"] += len(duplicates)
+        report["duplicate_ids"].extend(duplicates[:MAX_REPORTED - len(report["duplicate_ids"])])
+        chunk.clear()
+
+    try:
+        async for record in records:
+            row_number += 1
+            try:
+                todo = TodoCreate(**record)
+            except (ValidationError, TypeError) as error:
+                report["invalid"] += 1
+                if len(report["errors"]) < MAX_REPORTED:
+                    report["errors"].append({"row": row_number, "detail": str(error)})
+                continue
+            if todo.id in chunk:
+                report["duplicates"] += 1
+                if len(report["duplicate_ids"]) < MAX_REPORTED:
+                    report["duplicate_ids"].append(todo.id)
+                continue
+            chunk[todo.id] = dict(todo.dict(), owner_id=user["id"])
+            if len(chunk) >= chunk_size:
+                await flush()
+    except (ValueError, csv.Error) as error:
+        # Malformed JSON / CSV: keep what was already committed and say where we stopped
+        report["invalid"] += 1
+        report["errors"].append({"row": row_number + 1, "detail": f"Unreadable input, import stopped: {error}"})
+    if chunk:
+        await flush()
+
+    seconds = time.perf_counter() - start
+    report["seconds"] = seconds
+    report["rows_per_second"] = report["inserted"] / seconds if seconds else 0.0
+    return report